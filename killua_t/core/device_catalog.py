@@ -0,0 +1,77 @@
+# The devices visible to one user (their own plus shared ones), held in
+# memory for the session. Rows are (id, name, watt_per_hour, owner_id) as
+# returned by database.devices.fetch_devices(); they can be looked up by id
+# or by (owner, name), and searched by name through `index`.
+#
+# The catalog is filled once per session and then patched from
+# DevicesChanged events, so pages resolve devices and wattages without a
+# query. A change it can't apply (no device details) invalidates it, and the
+# next reader reloads it.
+from core.device_index import DeviceIndex
+
+
+def _key(owner_id, name):
+    # Device names are unique per owner, compared case-insensitively (MySQL collation)
+    return owner_id, name.casefold()
+
+
+class DeviceCatalog:
+    def __init__(self, user_id=None):
+        self.user_id = user_id
+        self.loaded = False
+        self.index = DeviceIndex()
+        self._by_id = {}
+        self._by_key = {}
+        self._changes = 0  # bumped by every apply(); detects loads that raced a change
+
+    def begin_load(self):
+        """Call before fetching rows; hand the result to replace()."""
+        return self._changes
+
+    def replace(self, rows, generation=None):
+        """Load `rows` (id, name, watt, owner_id). If a change arrived since
+        `generation` was taken, the rows may predate it and the catalog stays
+        marked for reloading."""
+        self._by_id = {}
+        self._by_key = {}
+        for row in rows:
+            self._by_id[row[0]] = row
+            self._by_key[_key(row[3], row[1])] = row[0]
+        self.index.rebuild((device_id, name, owner_id) for device_id, name, _, owner_id in rows)
+        self.loaded = generation is None or generation == self._changes
+
+    def invalidate(self):
+        self.loaded = False
+
+    def get(self, device_id):
+        return self._by_id.get(device_id)
+
+    def find(self, owner_id, name):
+        """The row of the device `name` owned by `owner_id` (None: shared), or None."""
+        return self._by_id.get(self._by_key.get(_key(owner_id, name)))
+
+    def lookup(self, name):
+        """The row for a picked `name`: the user's own device, else the shared one."""
+        return (self.user_id is not None and self.find(self.user_id, name)) or self.find(None, name)
+
+    def rows(self):
+        return [self._by_id[device_id] for device_id in sorted(self._by_id)]
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def apply(self, event):
+        """Fold a DevicesChanged event into the catalog."""
+        self._changes += 1
+        if event.device_id is None:
+            self.invalidate()
+            return
+        old = self._by_id.pop(event.device_id, None)
+        if old is not None:
+            self._by_key.pop(_key(old[3], old[1]), None)
+            self.index.remove(event.device_id)
+        row = event.device
+        if row is not None and row[3] in (None, self.user_id):
+            self._by_id[row[0]] = row
+            self._by_key[_key(row[3], row[1])] = row[0]
+            self.index.add(row[0], row[1], row[3])
@@ -0,0 +1,138 @@
+# In-memory search index over the devices a user can pick (their own plus
+# shared ones), used by the UsagePage type-ahead picker.
+#
+# Matching is case-insensitive and ranked: names starting with the query,
+# then names with a word starting with it, then (for queries of 3+
+# characters) names containing it anywhere. Prefix lookups are a bisect into
+# sorted key lists; substring lookups intersect trigram posting sets and only
+# verify the few survivors, so a search costs about the same on a catalog of
+# ten or ten thousand devices. Devices are added/removed one at a time as
+# they change, no rebuild needed.
+import re
+import heapq
+from bisect import bisect_left, insort
+
+_WORD = re.compile(r"\w+")
+
+
+def _fold(text):
+    return text.casefold()
+
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class DeviceIndex:
+    """Devices by id, searchable by name.
+
+    When an owned device and a shared one have the same name, only the owned
+    one is offered (it shadows the shared device, as in the picker before).
+    """
+
+    def __init__(self, devices=()):
+        self.rebuild(devices)
+
+    def rebuild(self, devices):
+        """Replace the contents with `devices`, an iterable of (id, name, owner_id)."""
+        self._devices = {}    # id -> (name, owner_id, folded name)
+        self._names = []      # sorted (folded name, id)
+        self._words = []      # sorted (folded word, id), words after the first
+        self._grams = {}      # trigram -> {id}
+        for device_id, name, owner_id in devices:
+            self.add(device_id, name, owner_id)
+
+    def __len__(self):
+        return len(self._devices)
+
+    def __contains__(self, device_id):
+        return device_id in self._devices
+
+    def add(self, device_id, name, owner_id=None):
+        """Add a device, or re-index it if the id is already present."""
+        if device_id in self._devices:
+            self.remove(device_id)
+        folded = _fold(name)
+        self._devices[device_id] = (name, owner_id, folded)
+        insort(self._names, (folded, device_id))
+        for word in _WORD.findall(folded)[1:]:
+            insort(self._words, (word, device_id))
+        for gram in _trigrams(folded):
+            self._grams.setdefault(gram, set()).add(device_id)
+
+    def remove(self, device_id):
+        entry = self._devices.pop(device_id, None)
+        if entry is None:
+            return
+        folded = entry[2]
+        _discard(self._names, (folded, device_id))
+        for word in _WORD.findall(folded)[1:]:
+            _discard(self._words, (word, device_id))
+        for gram in _trigrams(folded):
+            ids = self._grams.get(gram)
+            if ids is not None:
+                ids.discard(device_id)
+                if not ids:
+                    del self._grams[gram]
+
+    def name(self, device_id):
+        entry = self._devices.get(device_id)
+        return entry[0] if entry else None
+
+    def search(self, query, limit=20):
+        """Return up to `limit` (id, name) matches for `query`, best first.
+
+        An empty query lists devices alphabetically.
+        """
+        q = _fold(query.strip())
+        # A folded name occurs at most twice (owned + shared), so 2 * limit
+        # candidates per rank always yield `limit` distinct names.
+        cap = 2 * limit
+        # Later ranks are only computed if the earlier ones didn't fill `limit`
+        ranks = (
+            lambda: self._prefixed(self._names, q, cap),
+            lambda: self._prefixed(self._words, q, cap) if q else (),
+            lambda: self._containing(q),
+        )
+        out = []
+        seen_ids = set()
+        seen_names = set()
+        for rank in ranks:
+            rank_ids = rank()
+            # Within a rank, alphabetical; owned before shared for equal names
+            ranked = heapq.nsmallest(cap, (i for i in rank_ids if i not in seen_ids),
+                                     key=lambda i: (self._devices[i][2], self._devices[i][1] is None))
+            for device_id in ranked:
+                seen_ids.add(device_id)
+                name, _, folded = self._devices[device_id]
+                if folded in seen_names:
+                    continue
+                seen_names.add(folded)
+                out.append((device_id, name))
+                if len(out) >= limit:
+                    return out
+        return out
+
+    def _prefixed(self, keys, q, cap):
+        """Ids whose key starts with `q` (at most `cap` of them, in key order)."""
+        ids = []
+        i = bisect_left(keys, (q,))
+        while i < len(keys) and keys[i][0].startswith(q) and len(ids) < cap:
+            ids.append(keys[i][1])
+            i += 1
+        return ids
+
+    def _containing(self, q):
+        if len(q) < 3:
+            return ()
+        postings = sorted((self._grams.get(g, ()) for g in _trigrams(q)), key=len)
+        if not postings or not postings[0]:
+            return ()
+        ids = set(postings[0]).intersection(*postings[1:])
+        return [i for i in ids if q in self._devices[i][2]]
+
+
+def _discard(keys, key):
+    i = bisect_left(keys, key)
+    if i < len(keys) and keys[i] == key:
+        del keys[i]
@@ -0,0 +1,50 @@
+# Shape-preserving downsampling for charts.
+# Largest-Triangle-Three-Buckets (Steinarsson, 2013): keep the first and last
+# points, split the rest into equal buckets and from each keep the point that
+# forms the largest triangle with the previously kept point and the average
+# of the next bucket. Peaks and dips survive, unlike plain striding or
+# averaging, and the cost is a single O(n) pass.
+
+
+def lttb(xs, ys, threshold):
+    """Return (xs, ys) reduced to at most `threshold` points.
+
+    `xs` must be numeric and ascending. Series already within the budget (or
+    a budget under 3) are returned unchanged as lists.
+    """
+    xs = list(xs)
+    ys = list(ys)
+    n = len(xs)
+    if threshold >= n or threshold < 3:
+        return xs, ys
+
+    out_x = [xs[0]]
+    out_y = [ys[0]]
+    every = (n - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        # Average of the next bucket (the last bucket averages the final point)
+        next_start = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        if next_start >= next_end:
+            next_start, next_end = n - 1, n
+        span = next_end - next_start
+        avg_x = sum(xs[next_start:next_end]) / span
+        avg_y = sum(ys[next_start:next_end]) / span
+
+        # Point of this bucket with the largest triangle area
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        ax, ay = xs[a], ys[a]
+        best, best_area = start, -1.0
+        for j in range(start, end):
+            area = abs((ax - avg_x) * (ys[j] - ay) - (ax - xs[j]) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+        out_x.append(xs[best])
+        out_y.append(ys[best])
+        a = best
+
+    out_x.append(xs[-1])
+    out_y.append(ys[-1])
+    return out_x, out_y
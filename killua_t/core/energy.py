@@ -0,0 +1,127 @@
+# kWh and cost calculations shared by UsagePage, re-pricing and reports.
+# Everything that prices usage goes through these functions so the formula
+# (watts * hours / 1000 * rate) lives in one place. Inputs are sequences;
+# large batches are computed with NumPy when it is installed, small ones
+# (and installs without NumPy) use plain Python.
+try:
+    import numpy as np
+except ImportError:  # optional dependency
+    np = None
+
+# Below this many items the NumPy conversion costs more than it saves.
+NUMPY_MIN_ITEMS = 64
+
+
+class UsageTotals:
+    """Per-item and aggregated results of one calculation pass."""
+
+    __slots__ = ("kwh", "cost", "total_kwh", "total_cost")
+
+    def __init__(self, kwh, cost, total_kwh, total_cost):
+        self.kwh = kwh
+        self.cost = cost
+        self.total_kwh = total_kwh
+        self.total_cost = total_cost
+
+    def __repr__(self):
+        return f"UsageTotals(items={len(self.kwh)}, total_kwh={self.total_kwh:.4f}, total_cost={self.total_cost:.2f})"
+
+
+def _use_numpy(n):
+    return np is not None and n >= NUMPY_MIN_ITEMS
+
+
+def _floats(values):
+    """Floats for a column of stored values; NULL (None) counts as 0 on both paths."""
+    return [0.0 if v is None else float(v) for v in values]
+
+
+def _rounded(cost, ndigits):
+    # Always Python's round(): np.round rounds some half-cent values the other
+    # way (11.365 -> 11.36 vs 11.37), which would make stored costs depend on
+    # the batch size.
+    return [round(c, ndigits) for c in cost]
+
+
+def _broadcast(rates, n):
+    if isinstance(rates, (int, float)):
+        return [float(rates)] * n
+    rates = list(rates)
+    if len(rates) != n:
+        raise ValueError(f"expected {n} rates, got {len(rates)}")
+    return rates
+
+
+def item_usage(watts, minutes, rate):
+    """Return (kwh, cost) for a single device running `minutes` at `watts`."""
+    kwh = (float(watts) * (float(minutes) / 60)) / 1000
+    return kwh, kwh * float(rate)
+
+
+def compute(watts, minutes, rates, ndigits=None):
+    """Price a batch of usage items.
+
+    `watts` and `minutes` are equal-length sequences; `rates` is a single rate
+    or one rate per item. If `ndigits` is given, per-item costs are rounded
+    (e.g. 2 for the DECIMAL(12,2) columns) and the total is the sum of the
+    rounded costs.
+    """
+    n = len(watts)
+    if len(minutes) != n:
+        raise ValueError(f"expected {n} durations, got {len(minutes)}")
+    if _use_numpy(n):
+        w = np.asarray(_floats(watts))
+        m = np.asarray(_floats(minutes))
+        r = np.asarray(rates, dtype=float) if not isinstance(rates, (int, float)) else float(rates)
+        kwh = w * (m / 60) / 1000
+        cost = np.broadcast_to(kwh * r, kwh.shape)
+        if ndigits is not None:
+            cost = _rounded(cost.tolist(), ndigits)
+            return UsageTotals(kwh.tolist(), cost, float(kwh.sum()), sum(cost))
+        return UsageTotals(kwh.tolist(), cost.tolist(), float(kwh.sum()), float(cost.sum()))
+
+    rate_list = _broadcast(rates, n)
+    kwh = [(w * (m / 60)) / 1000 for w, m in zip(_floats(watts), _floats(minutes))]
+    cost = [k * r for k, r in zip(kwh, rate_list)]
+    if ndigits is not None:
+        cost = _rounded(cost, ndigits)
+    return UsageTotals(kwh, cost, sum(kwh), sum(cost))
+
+
+def price_kwh(kwh, rates, ndigits=None):
+    """Price already-measured kWh values (e.g. stored record_items.kwh_used)."""
+    n = len(kwh)
+    if _use_numpy(n):
+        k = np.asarray(_floats(kwh))
+        r = np.asarray(rates, dtype=float) if not isinstance(rates, (int, float)) else float(rates)
+        cost = np.broadcast_to(k * r, k.shape)
+        if ndigits is not None:
+            cost = _rounded(cost.tolist(), ndigits)
+            return UsageTotals(k.tolist(), cost, float(k.sum()), sum(cost))
+        return UsageTotals(k.tolist(), cost.tolist(), float(k.sum()), float(cost.sum()))
+
+    rate_list = _broadcast(rates, n)
+    k = _floats(kwh)
+    cost = [a * r for a, r in zip(k, rate_list)]
+    if ndigits is not None:
+        cost = _rounded(cost, ndigits)
+    return UsageTotals(k, cost, sum(k), sum(cost))
+
+
+def totals(kwh, cost):
+    """Sum already-priced items: returns (total_kwh, total_cost)."""
+    if _use_numpy(len(kwh)):
+        return float(np.sum(np.asarray(kwh, dtype=float))), float(np.sum(np.asarray(cost, dtype=float)))
+    return sum(kwh), sum(cost)
+
+
+def sum_by(keys, values):
+    """Group-and-sum `values` by `keys` in one pass; returns {key: total}."""
+    if _use_numpy(len(keys)):
+        uniq, inverse = np.unique(np.asarray(keys), return_inverse=True)
+        sums = np.bincount(inverse, weights=np.asarray(values, dtype=float))
+        return dict(zip(uniq.tolist(), sums.tolist()))
+    out = {}
+    for k, v in zip(keys, values):
+        out[k] = out.get(k, 0.0) + v
+    return out
@@ -0,0 +1,115 @@
+# In-process publish/subscribe for data changes.
+# Code that writes to the database publishes a typed change event once the
+# write has committed (from the Tk thread, e.g. in a UiTasks on_done
+# callback); pages subscribe to the kinds of change their view depends on.
+# Pages track this with a DirtyFlag and skip their reload in on_show() when
+# nothing relevant happened since the last one.
+
+
+class Change:
+    """Base class of all change events; `user_id` is whose data changed (None: shared)."""
+
+    __slots__ = ("user_id",)
+
+    def __init__(self, user_id=None):
+        self.user_id = user_id
+
+    def __repr__(self):
+        return f"{type(self).__name__}(user_id={self.user_id!r})"
+
+
+class DevicesChanged(Change):
+    """A device was added, edited or deleted.
+
+    `device_id` is the device that changed and `device` its new
+    (id, name, watt, owner_id) row, None once deleted. Both are None when
+    the change isn't about a single device; subscribers then reload.
+    """
+    __slots__ = ("device_id", "device")
+
+    def __init__(self, user_id=None, device_id=None, device=None):
+        super().__init__(user_id)
+        self.device_id = device_id
+        self.device = device
+
+
+class RecordsChanged(Change):
+    """Records/items were added, deleted or re-priced (rollups changed with them)."""
+    __slots__ = ()
+
+
+class RateChanged(Change):
+    """A new Meralco rate was recorded."""
+    __slots__ = ()
+
+
+class ProfileChanged(Change):
+    """The user's bio or profile picture changed."""
+    __slots__ = ()
+
+
+_subscribers = []  # [(event type, callback)]
+
+
+def subscribe(event_type, callback):
+    """Call `callback(event)` for every published instance of `event_type`
+    (a Change subclass or a tuple of them). Returns an unsubscribe function."""
+    entry = (event_type, callback)
+    _subscribers.append(entry)
+
+    def unsubscribe():
+        if entry in _subscribers:
+            _subscribers.remove(entry)
+    return unsubscribe
+
+
+def publish(event):
+    for event_type, callback in list(_subscribers):
+        if isinstance(event, event_type):
+            try:
+                callback(event)
+            except Exception as e:
+                print(f"[events] {callback!r} failed on {event!r}: {e}")
+
+
+class DirtyFlag:
+    """Whether a view must reload its data.
+
+    Marked by any of `event_types` concerning the view's user (or shared
+    data), and always dirty for a user it hasn't loaded yet. Typical use:
+
+        if self.dirty.needs_refresh(uid):
+            generation = self.dirty.begin(uid)
+            ... load, then on success: self.dirty.done(generation)
+
+    Changes published while a load is in flight keep the flag dirty.
+    """
+
+    def __init__(self, *event_types):
+        self.dirty = True
+        self.user_id = None
+        self._generation = 0
+        if event_types:
+            subscribe(event_types, self._on_change)
+
+    def _on_change(self, event):
+        if event.user_id is None or event.user_id == self.user_id:
+            self.mark()
+
+    def mark(self):
+        self.dirty = True
+        self._generation += 1
+
+    def needs_refresh(self, user_id):
+        return self.dirty or user_id != self.user_id
+
+    def begin(self, user_id):
+        """Start a load for `user_id`; pass the result to done() once it succeeded."""
+        if user_id != self.user_id:
+            self.user_id = user_id
+            self.mark()
+        return self._generation
+
+    def done(self, generation):
+        if generation == self._generation:
+            self.dirty = False
@@ -0,0 +1,38 @@
+# The logged-in user's context for the lifetime of a login.
+# Built once when the user logs in or registers (see KilluaT.login) and kept
+# in memory, so switching pages never has to go back to the database for the
+# username, bio or avatar. Code that changes those values (profile upload,
+# bio save) updates the session directly; the avatar images are decoded
+# lazily and dropped whenever profile_pic changes. `devices` is the user's
+# device catalog, loaded on first use (see KilluaT.load_devices).
+from core.device_catalog import DeviceCatalog
+
+
+class Session:
+    __slots__ = ("user_id", "username", "bio", "profile_pic", "avatars", "devices")
+
+    def __init__(self, user_id, username, bio=None, profile_pic=None):
+        self.user_id = user_id
+        self.username = username
+        self.bio = bio or ""
+        self.profile_pic = profile_pic
+        self.avatars = {}  # (width, height) -> decoded image, filled by the UI
+        self.devices = DeviceCatalog(user_id)
+
+    @classmethod
+    def from_row(cls, row):
+        """Build a session from a (id, username, bio, profile_pic) users row."""
+        user_id, username, bio, profile_pic = row
+        return cls(user_id, username, bio, profile_pic)
+
+    def set_profile_pic(self, path):
+        """Record a new profile picture; cached avatar images are invalidated."""
+        self.profile_pic = path
+        self.avatars.clear()
+
+    def avatar(self, size, load):
+        """Return the avatar at `size`, decoding it with `load(path, size)` on first use."""
+        key = tuple(size)
+        if key not in self.avatars:
+            self.avatars[key] = load(self.profile_pic, key) if self.profile_pic else None
+        return self.avatars[key]
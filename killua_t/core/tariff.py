@@ -0,0 +1,140 @@
+# Tariff model and bill evaluator.
+# A tariff is a list of components (per-kWh charges such as generation,
+# transmission and distribution; fixed monthly charges such as metering;
+# percentage charges such as VAT applied to the running subtotal) plus
+# optional consumption brackets: "block" brackets add a per-kWh surcharge to
+# the kWh that fall inside them, "lifeline" brackets discount the energy
+# charges when the whole month's consumption falls inside them.
+#
+# Bracket boundaries and cumulative block charges are precomputed when the
+# Tariff is built, so pricing a month is a couple of binary searches.
+from bisect import bisect_right
+
+PER_KWH = "per_kwh"
+FIXED = "fixed"
+PERCENT = "percent"
+COMPONENT_KINDS = (PER_KWH, FIXED, PERCENT)
+
+BLOCK = "block"
+LIFELINE = "lifeline"
+TIER_KINDS = (BLOCK, LIFELINE)
+
+
+class Component:
+    __slots__ = ("name", "kind", "amount")
+
+    def __init__(self, name, kind, amount):
+        if kind not in COMPONENT_KINDS:
+            raise ValueError(f"unknown component kind: {kind!r}")
+        self.name = name
+        self.kind = kind
+        self.amount = float(amount)
+
+
+class Tier:
+    """Consumption bracket [lower_kwh, upper_kwh); upper_kwh None means open-ended."""
+
+    __slots__ = ("kind", "lower_kwh", "upper_kwh", "amount")
+
+    def __init__(self, kind, lower_kwh, upper_kwh, amount):
+        if kind not in TIER_KINDS:
+            raise ValueError(f"unknown tier kind: {kind!r}")
+        self.kind = kind
+        self.lower_kwh = float(lower_kwh)
+        self.upper_kwh = None if upper_kwh is None else float(upper_kwh)
+        self.amount = float(amount)
+
+
+class Bill:
+    """Result of pricing one month: ordered (label, amount) lines and the total."""
+
+    def __init__(self, kwh, lines, total):
+        self.kwh = kwh
+        self.lines = lines
+        self.total = total
+
+    def __repr__(self):
+        return f"Bill(kwh={self.kwh:.2f}, total={self.total:.2f})"
+
+
+def _brackets(tiers):
+    """Sort non-overlapping brackets and return (lowers, uppers, amounts)."""
+    tiers = sorted(tiers, key=lambda t: t.lower_kwh)
+    lowers, uppers, amounts = [], [], []
+    for t in tiers:
+        upper = float("inf") if t.upper_kwh is None else t.upper_kwh
+        if lowers and t.lower_kwh < uppers[-1]:
+            raise ValueError("tariff brackets overlap")
+        lowers.append(t.lower_kwh)
+        uppers.append(upper)
+        amounts.append(t.amount)
+    return lowers, uppers, amounts
+
+
+class Tariff:
+    def __init__(self, name, components, tiers=(), effective_from=None, tariff_id=None):
+        self.id = tariff_id
+        self.name = name
+        self.effective_from = effective_from
+        self.components = list(components)
+        self.tiers = list(tiers)
+
+        self.per_kwh = [c for c in self.components if c.kind == PER_KWH]
+        self.fixed = [c for c in self.components if c.kind == FIXED]
+        self.percent = [c for c in self.components if c.kind == PERCENT]
+        self.energy_rate = sum(c.amount for c in self.per_kwh)
+        self.fixed_total = sum(c.amount for c in self.fixed)
+
+        # Block brackets: cumulative surcharge at each bracket's lower bound, so
+        # charge(x) = cum[i] + (min(x, upper[i]) - lower[i]) * amount[i].
+        self._block_lo, self._block_hi, self._block_amt = _brackets(t for t in self.tiers if t.kind == BLOCK)
+        self._block_cum = []
+        running = 0.0
+        for lo, hi, amt in zip(self._block_lo, self._block_hi, self._block_amt):
+            self._block_cum.append(running)
+            if hi != float("inf"):
+                running += (hi - lo) * amt
+
+        self._life_lo, self._life_hi, self._life_pct = _brackets(t for t in self.tiers if t.kind == LIFELINE)
+
+    def _block_charge(self, kwh):
+        i = bisect_right(self._block_lo, kwh) - 1
+        if i < 0:
+            return 0.0
+        within = min(kwh, self._block_hi[i]) - self._block_lo[i]
+        return self._block_cum[i] + within * self._block_amt[i]
+
+    def _lifeline_pct(self, kwh):
+        i = bisect_right(self._life_lo, kwh) - 1
+        if i < 0 or kwh >= self._life_hi[i]:
+            return 0.0
+        return self._life_pct[i]
+
+    def bill(self, kwh):
+        """Price one month's consumption and return an itemized Bill."""
+        kwh = max(float(kwh or 0.0), 0.0)
+        lines = [(c.name, kwh * c.amount) for c in self.per_kwh]
+        energy = kwh * self.energy_rate
+        if self._block_lo:
+            block = self._block_charge(kwh)
+            if block:
+                lines.append(("Consumption tier", block))
+                energy += block
+        pct = self._lifeline_pct(kwh)
+        if pct and energy:
+            discount = -energy * pct / 100
+            lines.append(("Lifeline discount", discount))
+            energy += discount
+        lines.extend((c.name, c.amount) for c in self.fixed)
+        subtotal = energy + self.fixed_total
+        for c in self.percent:
+            charge = subtotal * c.amount / 100
+            lines.append((c.name, charge))
+            subtotal += charge
+        # Round to centavos; `+ 0.0` folds a -0.0 left by a full lifeline discount.
+        return Bill(kwh, lines, round(subtotal, 2) + 0.0)
+
+    @classmethod
+    def flat(cls, rate, name="Flat rate"):
+        """A single per-kWh component; equivalent to the legacy flat PHP/kWh rate."""
+        return cls(name, [Component("Energy charge", PER_KWH, rate)])
@@ -1,11 +1,30 @@
 import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
 # Database connection and setup for Killua-T application.
 # Supports MySQL as the backend database.
 # To use MySQL explicitly set `KILLUA_DB_TYPE=mysql` and configure the
 # MySQL connection env vars as needed.
+#
+# Connections come from a pool (see database/pool.py). The module-level
+# `conn` and `cursor` objects are thin proxies that resolve to the calling
+# thread's own connection, so existing page code keeps working while
+# background threads get connections and cursors of their own.
+
+from database.pool import ConnectionPool
+from database import instrument, migrations
+from database.sqltranslate import translate
 
 DB_TYPE = "mysql"
 DEFAULT_MERALCO_RATE = float(os.getenv("DEFAULT_MERALCO_RATE", "12.64"))
+DB_POOL_SIZE = int(os.getenv("KILLUA_DB_POOL_SIZE", 5))
+DB_POOL_TIMEOUT = float(os.getenv("KILLUA_DB_POOL_TIMEOUT", 30))
+DB_HEALTH_CHECK_INTERVAL = float(os.getenv("KILLUA_DB_HEALTH_CHECK_INTERVAL", 30))
+DB_PREPARED = os.getenv("KILLUA_DB_PREPARED", "0").lower() in ("1", "true", "yes")
+PREPARED_CACHE_SIZE = int(os.getenv("KILLUA_DB_PREPARED_CACHE", 32))
 
 if DB_TYPE == "mysql":
     try:
@@ -19,156 +38,335 @@ if DB_TYPE == "mysql":
     DB_PASS = os.getenv("KILLUA_DB_PASS", "KilluaPass123")
     DB_NAME = os.getenv("KILLUA_DB_NAME", "killua_t")
 
-    conn = mysql.connector.connect(
-        host=DB_HOST,
-        port=DB_PORT,
-        user=DB_USER,
-        password=DB_PASS,
-        database=DB_NAME,
-        autocommit=False,
-        charset='utf8mb4'
+    def _connect():
+        return mysql.connector.connect(
+            host=DB_HOST,
+            port=DB_PORT,
+            user=DB_USER,
+            password=DB_PASS,
+            database=DB_NAME,
+            autocommit=False,
+            charset='utf8mb4'
+        )
+
+    pool = ConnectionPool(
+        _connect,
+        size=DB_POOL_SIZE,
+        timeout=DB_POOL_TIMEOUT,
+        health_check_interval=DB_HEALTH_CHECK_INTERVAL,
     )
 
     # Wrap the mysql.connector cursor so existing code that uses
-    # SQLite-style ? placeholders will keep working. We translate
-    # '?' -> '%s' before executing when using MySQL.
+    # SQLite-style ? placeholders will keep working. Statements are
+    # tokenized once and cached (see database/sqltranslate.py) so quoted
+    # '?' and '%' characters survive translation.
+    #
+    # With KILLUA_DB_PREPARED=1, parameterized statements run on
+    # server-side prepared statements instead: one prepared cursor per
+    # distinct SQL text, kept in a small per-connection LRU so repeated
+    # queries skip the server's parse step.
     class _ParamTranslateCursor:
-        def __init__(self, real_cursor):
+        def __init__(self, real_cursor, prepared_from=None):
             self._cur = real_cursor
+            self._active = real_cursor
+            self._conn = prepared_from if DB_PREPARED else None
+            self._prepared = OrderedDict()
+            self._stat = None  # instrument stats of the last statement, for row counts
+
+        def _cursor_for(self, sql):
+            """Pick the cursor to run `sql` on and make it the one results are read from.
 
-        def _translate(self, sql):
-            # simple replace of SQLite '?' with MySQL '%s'
-            if sql is None:
-                return sql
-            return sql.replace('?', '%s')
+            `sql` is None for statements without parameters, which always use
+            the plain cursor.
+            """
+            if self._conn is None or sql is None:
+                target = self._cur
+            else:
+                target = self._prepared.get(sql)
+                if target is None:
+                    target = self._conn.cursor(prepared=True)
+                    self._prepared[sql] = target
+                    if len(self._prepared) > PREPARED_CACHE_SIZE:
+                        _, evicted = self._prepared.popitem(last=False)
+                        self._close_quietly(evicted)
+                else:
+                    self._prepared.move_to_end(sql)
+            if target is not self._active:
+                self._drain(self._active)
+                self._active = target
+            return target
+
+        @staticmethod
+        def _drain(cur):
+            # Unread rows on one cursor block statements on every other
+            # cursor of the same connection.
+            try:
+                if getattr(cur, "with_rows", False):
+                    cur.fetchall()
+            except Exception:
+                pass
+
+        @staticmethod
+        def _close_quietly(cur):
+            try:
+                cur.close()
+            except Exception:
+                pass
 
         def execute(self, sql, params=None):
-            sql2 = self._translate(sql)
+            if instrument.ENABLED:
+                result, self._stat = instrument.timed_execute(self, sql, self._execute, sql, params)
+                return result
+            return self._execute(sql, params)
+
+        def _execute(self, sql, params):
             if params is None:
-                return self._cur.execute(sql2)
-            return self._cur.execute(sql2, params)
+                # Nothing to bind: send the text untouched.
+                return self._cursor_for(None).execute(sql)
+            if isinstance(params, dict):
+                return self._cursor_for(None).execute(sql, params)
+            # Prepared statements keep literals inline (see sqltranslate)
+            t = translate(sql, self._conn is None)
+            return self._cursor_for(t.sql).execute(t.sql, t.bind(params))
 
         def executemany(self, sql, seq_of_params):
-            sql2 = self._translate(sql)
-            return self._cur.executemany(sql2, seq_of_params)
+            if instrument.ENABLED:
+                result, self._stat = instrument.timed_execute(self, sql, self._executemany, sql, seq_of_params)
+                return result
+            return self._executemany(sql, seq_of_params)
+
+        def _executemany(self, sql, seq_of_params):
+            t = translate(sql, self._conn is None)
+            seq = [t.bind(p) for p in seq_of_params] if t.lifted else seq_of_params
+            return self._cursor_for(t.sql).executemany(t.sql, seq)
+
+        def _fetch(self, method, *args):
+            if not instrument.ENABLED:
+                return getattr(self._active, method)(*args)
+            start = time.perf_counter()
+            result = getattr(self._active, method)(*args)
+            rows = (1 if result is not None else 0) if method == "fetchone" else len(result)
+            instrument.record_fetch(self._stat, rows, (time.perf_counter() - start) * 1000)
+            return result
+
+        def fetchone(self):
+            return self._fetch("fetchone")
+
+        def fetchmany(self, size=None):
+            return self._fetch("fetchmany", *(() if size is None else (size,)))
+
+        def fetchall(self):
+            return self._fetch("fetchall")
+
+        def close(self):
+            for cur in self._prepared.values():
+                self._close_quietly(cur)
+            self._prepared.clear()
+            return self._cur.close()
 
         def __getattr__(self, name):
-            return getattr(self._cur, name)
+            return getattr(self._active, name)
 
-    cursor = _ParamTranslateCursor(conn.cursor())
+    _local = threading.local()
 
-    # Create tables (MySQL-compatible)
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS devices (
-        id INT AUTO_INCREMENT PRIMARY KEY,
-        name VARCHAR(255) NOT NULL,
-        watt_per_hour DOUBLE NOT NULL,
-        user_id INT NULL
-    )
-    """)
-
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS records (
-        id INT AUTO_INCREMENT PRIMARY KEY,
-        date VARCHAR(50) NOT NULL,
-        total_kwh DOUBLE,
-        total_cost DECIMAL(12,2)
-    )
-    """)
-
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS record_items (
-        id INT AUTO_INCREMENT PRIMARY KEY,
-        record_id INT,
-        device_name VARCHAR(255),
-        watt_per_hour DOUBLE,
-        duration_minutes DOUBLE,
-        kwh_used DOUBLE,
-        cost DECIMAL(12,2)
-    )
-    """)
-
-    # Users table
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS users (
-        id INT AUTO_INCREMENT PRIMARY KEY,
-        username VARCHAR(150) NOT NULL UNIQUE,
-        password_hash VARCHAR(255) NOT NULL,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        profile_pic VARCHAR(255) NULL,
-        bio TEXT NULL
-    )
-    """)
+    def _thread_cursor():
+        """Return the calling thread's cursor, re-creating it if its connection was replaced."""
+        ensure_schema()
+        real_conn = pool.thread_connection()
+        cur = getattr(_local, "cursor", None)
+        if cur is None or getattr(_local, "conn", None) is not real_conn:
+            cur = _ParamTranslateCursor(real_conn.cursor(), prepared_from=real_conn)
+            _local.conn = real_conn
+            _local.cursor = cur
+        return cur
 
-    # Meralco rate history
-    cursor.execute(
-        """
-        CREATE TABLE IF NOT EXISTS meralco_rates (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            rate DOUBLE NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
+    class _ThreadConnection:
+        """Proxy for the calling thread's pooled connection (commit, rollback, cursor, ...)."""
+
+        def __getattr__(self, name):
+            ensure_schema()
+            return getattr(pool.thread_connection(), name)
+
+    class _ThreadCursor:
+        """Proxy for the calling thread's translated cursor."""
+
+        def __getattr__(self, name):
+            return getattr(_thread_cursor(), name)
+
+    conn = _ThreadConnection()
+    cursor = _ThreadCursor()
+
+    def release_thread_connection():
+        """Return the calling thread's connection to the pool (call when a worker thread finishes)."""
+        cur = getattr(_local, "cursor", None)
+        if cur is not None:
+            try:
+                cur.close()
+            except Exception:
+                pass
+        _local.cursor = None
+        _local.conn = None
+        pool.release_thread_connection()
+
+    @contextmanager
+    def connection():
+        """Check out a dedicated connection for the duration of the block.
+
+        Yields `(conn, cursor)`; the cursor accepts ? placeholders like the
+        module-level one. The connection goes back to the pool afterwards and
+        any uncommitted work is rolled back.
         """
-    )
+        ensure_schema()
+        with pool.connection() as real_conn:
+            cur = _ParamTranslateCursor(real_conn.cursor(), prepared_from=real_conn)
+            try:
+                yield real_conn, cur
+            finally:
+                try:
+                    cur.close()
+                except Exception:
+                    pass
 
-    # If the DB existed before we added `user_id` columns, ALTER TABLE to add them.
-    try:
-        # devices.user_id
-        cursor.execute("SHOW COLUMNS FROM devices LIKE 'user_id'")
-        if not cursor.fetchone():
-            cursor.execute("ALTER TABLE devices ADD COLUMN user_id INT NULL")
-
-        # records.user_id (may be missing on older DBs)
-        cursor.execute("SHOW COLUMNS FROM records LIKE 'user_id'")
-        if not cursor.fetchone():
-            cursor.execute("ALTER TABLE records ADD COLUMN user_id INT NULL")
-        # users.profile_pic and users.bio
-        cursor.execute("SHOW COLUMNS FROM users LIKE 'profile_pic'")
-        if not cursor.fetchone():
-            cursor.execute("ALTER TABLE users ADD COLUMN profile_pic VARCHAR(255) NULL")
-        cursor.execute("SHOW COLUMNS FROM users LIKE 'bio'")
-        if not cursor.fetchone():
-            cursor.execute("ALTER TABLE users ADD COLUMN bio TEXT NULL")
+    @contextmanager
+    def transaction():
+        """Run the block in its own pooled connection, committing on success and rolling back on error."""
+        with connection() as (real_conn, cur):
+            try:
+                yield cur
+                real_conn.commit()
+            except Exception:
+                real_conn.rollback()
+                raise
 
-    except Exception:
-        # If any of these fail (older MySQL versions, permissions), ignore and continue;
-        # the app will raise clearer errors later when attempting to use the columns.
-        pass
+    _schema_lock = threading.Lock()
+    _schema_ready = False
 
-    conn.commit()
+    def _bootstrap_schema(real_conn, cur):
+        """Apply pending migrations unless the stored schema version is already current."""
+        version = migrations.current_version(cur)
+        if version is not None and version >= migrations.latest_version():
+            return
+        try:
+            real_conn.rollback()
+        except Exception:
+            pass
+        migrations.migrate(real_conn, cur)
 
-    # Seed default rate if missing
-    try:
-        cursor.execute("SELECT rate FROM meralco_rates ORDER BY created_at DESC LIMIT 1")
-        if not cursor.fetchone():
-            cursor.execute("INSERT INTO meralco_rates (rate) VALUES (%s)", (DEFAULT_MERALCO_RATE,))
-            conn.commit()
-    except Exception:
-        pass
+    def ensure_schema():
+        """Create or upgrade the schema once per process; later calls return immediately.
+
+        Runs on a dedicated pooled connection. If a background bootstrap is
+        in progress the caller waits for it instead of repeating the work.
+        """
+        global _schema_ready
+        if _schema_ready:
+            return
+        with _schema_lock:
+            if _schema_ready:
+                return
+            with pool.connection() as real_conn:
+                cur = _ParamTranslateCursor(real_conn.cursor())
+                try:
+                    _bootstrap_schema(real_conn, cur)
+                finally:
+                    try:
+                        cur.close()
+                    except Exception:
+                        pass
+            _schema_ready = True
+
+    def _background_bootstrap():
+        try:
+            ensure_schema()
+        except Exception as e:
+            # The next foreground query retries and surfaces the real error.
+            print(f"[db] Background schema bootstrap failed: {e}")
+
+    def start_background_bootstrap():
+        """Kick off ensure_schema() on a daemon thread so startup isn't blocked on DDL round-trips."""
+        if _schema_ready:
+            return None
+        t = threading.Thread(target=_background_bootstrap, name="killua-db-bootstrap", daemon=True)
+        t.start()
+        return t
 
 else:
     raise RuntimeError("This build is configured for MySQL only.")
 
 
-def get_current_rate(default: float = DEFAULT_MERALCO_RATE) -> float:
-    """Return the latest stored Meralco rate, falling back to default if none exists."""
+# Process-wide cache of the latest rate. Pages call get_current_rate() on
+# every show, so we only hit the database when the cache is empty, stale
+# (KILLUA_RATE_CACHE_TTL seconds, for setups where another client may add
+# rates; 0 = keep until invalidated) or explicitly refreshed.
+RATE_CACHE_TTL = float(os.getenv("KILLUA_RATE_CACHE_TTL", "0"))
+_rate_lock = threading.Lock()
+_rate_cache = {"value": None, "loaded_at": 0.0}
+
+
+def _cached_rate():
+    with _rate_lock:
+        value = _rate_cache["value"]
+        if value is None:
+            return None
+        if RATE_CACHE_TTL > 0 and time.monotonic() - _rate_cache["loaded_at"] > RATE_CACHE_TTL:
+            return None
+        return value
+
+
+def _store_rate(value):
+    with _rate_lock:
+        _rate_cache["value"] = float(value)
+        _rate_cache["loaded_at"] = time.monotonic()
+
+
+def invalidate_rate_cache():
+    """Forget the cached rate so the next get_current_rate() reads the database."""
+    with _rate_lock:
+        _rate_cache["value"] = None
+        _rate_cache["loaded_at"] = 0.0
+
+
+def get_current_rate(default: float = DEFAULT_MERALCO_RATE, refresh: bool = False) -> float:
+    """Return the latest stored Meralco rate, falling back to default if none exists.
+
+    Served from the process-wide cache unless `refresh` is set or the TTL expired.
+    """
+    if not refresh:
+        cached = _cached_rate()
+        if cached is not None:
+            return cached
     try:
         cursor.execute("SELECT rate FROM meralco_rates ORDER BY created_at DESC LIMIT 1")
         row = cursor.fetchone()
         if row and row[0] is not None:
+            _store_rate(row[0])
             return float(row[0])
     except Exception:
         pass
     return float(default)
 
 
-def add_meralco_rate(rate: float):
-    """Insert a new Meralco rate entry (MySQL)."""
+def add_meralco_rate(rate: float, effective_at=None):
+    """Insert a new Meralco rate entry (MySQL) and update the rate cache and index.
+
+    `effective_at` backdates the change (defaults to now); the rate applies
+    to usage recorded from that moment until the next change.
+    """
+    ts = (effective_at or datetime.now()).replace(microsecond=0)
     try:
-        cursor.execute("INSERT INTO meralco_rates (rate) VALUES (%s)", (float(rate),))
+        cursor.execute("INSERT INTO meralco_rates (rate, created_at) VALUES (%s, %s)", (float(rate), ts))
         conn.commit()
     except Exception:
         conn.rollback()
+        invalidate_rate_cache()
+        return
+    from database import rates
+    rates.note_rate_added(ts, rate)
+    if effective_at is None:
+        _store_rate(rate)
+    else:
+        # A backdated change may not be the newest one; let the next read decide.
+        invalidate_rate_cache()
 
 
 def get_rate_history(limit: int = 50):
@@ -180,3 +378,40 @@ def get_rate_history(limit: int = 50):
         return cursor.fetchall()
     except Exception:
         return []
+
+
+# Rows per multi-row INSERT statement; keeps packets well under max_allowed_packet.
+INSERT_CHUNK_SIZE = int(os.getenv("KILLUA_DB_INSERT_CHUNK", 500))
+
+
+def insert_many(cur, table, columns, rows, return_ids=False, chunk_size=None):
+    """Insert `rows` with multi-row `INSERT ... VALUES (...), (...)` statements.
+
+    One round-trip per `chunk_size` rows instead of one per row. Does not
+    commit. With `return_ids`, returns the generated ids in row order; this
+    relies on InnoDB handing out consecutive ids to a single multi-row insert
+    (true for "simple inserts" under the default auto-inc lock modes) and
+    honours auto_increment_increment.
+    """
+    rows = list(rows)
+    if not rows:
+        return [] if return_ids else None
+    chunk_size = chunk_size or INSERT_CHUNK_SIZE
+    col_sql = ", ".join(columns)
+    row_sql = "(" + ", ".join(["%s"] * len(columns)) + ")"
+    step = 1
+    if return_ids:
+        cur.execute("SELECT @@auto_increment_increment")
+        step = int(cur.fetchone()[0] or 1)
+    ids = []
+    for i in range(0, len(rows), chunk_size):
+        chunk = rows[i:i + chunk_size]
+        params = [value for row in chunk for value in row]
+        cur.execute(
+            f"INSERT INTO {table} ({col_sql}) VALUES " + ", ".join([row_sql] * len(chunk)),
+            tuple(params),
+        )
+        if return_ids:
+            first = cur.lastrowid
+            ids.extend(first + k * step for k in range(len(chunk)))
+    return ids if return_ids else None
@@ -0,0 +1,16 @@
+# Device queries. The app reads devices through the session's DeviceCatalog
+# (core/device_catalog.py), which is filled from fetch_devices() once per
+# session and then kept current from DevicesChanged events.
+from database import db
+
+
+def fetch_devices(user_id):
+    """Return (id, name, watt_per_hour, user_id) rows of the user's devices
+    and the shared ones (user_id IS NULL), in id order."""
+    cursor = db.cursor
+    if user_id:
+        cursor.execute("SELECT id, name, watt_per_hour, user_id FROM devices "
+                       "WHERE user_id = ? OR user_id IS NULL ORDER BY id", (user_id,))
+    else:
+        cursor.execute("SELECT id, name, watt_per_hour, user_id FROM devices WHERE user_id IS NULL ORDER BY id")
+    return cursor.fetchall()
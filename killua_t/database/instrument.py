@@ -0,0 +1,182 @@
+# Optional query instrumentation for the cursor layer in database/db.py.
+# Enable with KILLUA_DB_INSTRUMENT=1. Every statement run through the
+# translated cursors is then timed and counted per normalized SQL text and per
+# calling function (the first frame outside the cursor layer, e.g.
+# "pages.home._fetch_recent_entries" or "database.tariffs.monthly_usage").
+# Statements slower than KILLUA_DB_SLOW_MS are printed as they happen, and a
+# JSON summary is written to KILLUA_DB_STATS_FILE when the process exits.
+#
+# Latency is measured around execute(); with unbuffered cursors the time
+# spent fetching rows is tracked separately as fetch_ms.
+import atexit
+import json
+import os
+import re
+import sys
+import threading
+import time
+from functools import lru_cache
+
+ENABLED = os.getenv("KILLUA_DB_INSTRUMENT", "0").lower() in ("1", "true", "yes")
+SLOW_MS = float(os.getenv("KILLUA_DB_SLOW_MS", 200))
+STATS_FILE = os.getenv("KILLUA_DB_STATS_FILE", "killua_db_stats.json")
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open.
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+# Modules that make up the cursor layer itself; caller attribution skips them.
+_LAYER_MODULES = {"database.db", "database.instrument", "database.pool", "contextlib"}
+
+
+class StatementStats:
+    __slots__ = ("sql", "calls", "total_ms", "max_ms", "fetch_ms", "rows", "affected",
+                 "buckets", "callers")
+
+    def __init__(self, sql):
+        self.sql = sql
+        self.calls = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.fetch_ms = 0.0
+        self.rows = 0        # rows returned to the caller
+        self.affected = 0    # rows changed by INSERT/UPDATE/DELETE
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+        self.callers = {}
+
+    def as_dict(self):
+        labels = [f"<={b}ms" for b in BUCKETS_MS] + [f">{BUCKETS_MS[-1]}ms"]
+        return {
+            "sql": self.sql,
+            "calls": self.calls,
+            "total_ms": round(self.total_ms, 3),
+            "mean_ms": round(self.total_ms / self.calls, 3) if self.calls else 0.0,
+            "max_ms": round(self.max_ms, 3),
+            "fetch_ms": round(self.fetch_ms, 3),
+            "rows": self.rows,
+            "affected": self.affected,
+            "histogram": {label: n for label, n in zip(labels, self.buckets) if n},
+            "callers": dict(sorted(self.callers.items(), key=lambda kv: -kv[1])),
+        }
+
+
+_lock = threading.Lock()
+_stats = {}
+_callers = {}  # caller -> [calls, total_ms]
+
+_VALUE_LIST = re.compile(r"\(\s*(?:%s|\?)(?:\s*,\s*(?:%s|\?))*\s*\)(?:\s*,\s*\(\s*(?:%s|\?)(?:\s*,\s*(?:%s|\?))*\s*\))*")
+_CASE_ARMS = re.compile(r"(?:WHEN\s+(?:%s|\?)\s+THEN\s+(?:%s|\?)\s*)+", re.IGNORECASE)
+
+
+@lru_cache(maxsize=512)
+def normalize(sql):
+    """Collapse whitespace and variable-length placeholder lists so batched
+    statements (multi-row VALUES, IN lists, CASE updates) share one entry."""
+    sql = " ".join(sql.split())
+    sql = _VALUE_LIST.sub("(...)", sql)
+    return _CASE_ARMS.sub("WHEN ... ", sql)
+
+
+def caller():
+    """Return "module.function" of the first frame outside the cursor layer."""
+    frame = sys._getframe(1)
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "?")
+        if module not in _LAYER_MODULES:
+            return f"{module}.{frame.f_code.co_name}"
+        frame = frame.f_back
+    return "?"
+
+
+def _stat(sql):
+    key = normalize(sql)
+    stat = _stats.get(key)
+    if stat is None:
+        stat = _stats[key] = StatementStats(key)
+    return stat
+
+
+def record(sql, elapsed_ms, affected=0, who=None):
+    """Account one execute() of `sql`; returns the StatementStats it was added to."""
+    who = who or caller()
+    i = 0
+    while i < len(BUCKETS_MS) and elapsed_ms > BUCKETS_MS[i]:
+        i += 1
+    with _lock:
+        stat = _stat(sql)
+        stat.calls += 1
+        stat.total_ms += elapsed_ms
+        stat.max_ms = max(stat.max_ms, elapsed_ms)
+        stat.affected += max(affected, 0)
+        stat.buckets[i] += 1
+        stat.callers[who] = stat.callers.get(who, 0) + 1
+        totals = _callers.setdefault(who, [0, 0.0])
+        totals[0] += 1
+        totals[1] += elapsed_ms
+    if elapsed_ms >= SLOW_MS:
+        print(f"[db] slow query ({elapsed_ms:.1f} ms) from {who}: {stat.sql[:300]}")
+    return stat
+
+
+def record_fetch(stat, rows, elapsed_ms):
+    if stat is None:
+        return
+    with _lock:
+        stat.rows += rows
+        stat.fetch_ms += elapsed_ms
+
+
+def timed_execute(cur, sql, fn, *args):
+    """Run `fn(*args)` (an execute on `cur`) and account it against `sql`.
+
+    Returns (result, stats); the stats are passed back to record_fetch() when
+    the caller reads the rows.
+    """
+    start = time.perf_counter()
+    result = fn(*args)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    active = getattr(cur, "_active", cur)
+    affected = 0 if getattr(active, "with_rows", False) else (getattr(active, "rowcount", 0) or 0)
+    return result, record(sql, elapsed_ms, affected)
+
+
+def summary():
+    with _lock:
+        statements = sorted((s.as_dict() for s in _stats.values()), key=lambda d: -d["total_ms"])
+        callers = {
+            who: {"calls": calls, "total_ms": round(total, 3)}
+            for who, (calls, total) in sorted(_callers.items(), key=lambda kv: -kv[1][1])
+        }
+    return {"slow_ms": SLOW_MS, "statements": statements, "callers": callers}
+
+
+def export(path=None):
+    """Write summary() as JSON to `path` (default KILLUA_DB_STATS_FILE)."""
+    path = path or STATS_FILE
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(summary(), f, indent=2)
+    return path
+
+
+def reset():
+    with _lock:
+        _stats.clear()
+        _callers.clear()
+
+
+def _export_at_exit():
+    if ENABLED and _stats:
+        try:
+            print(f"[db] query stats written to {export()}")
+        except Exception as e:
+            print(f"[db] could not write query stats: {e}")
+
+
+def enable(slow_ms=None):
+    """Turn instrumentation on at runtime (e.g. from a script)."""
+    global ENABLED, SLOW_MS
+    ENABLED = True
+    if slow_ms is not None:
+        SLOW_MS = float(slow_ms)
+
+
+atexit.register(_export_at_exit)
@@ -0,0 +1,418 @@
+# Versioned schema migrations for Killua-T.
+# Each migration is a function registered with @migration(version, description).
+# `migrate()` applies the ones newer than what `schema_migrations` records, in
+# order, and records each version as it completes. Migrations must be safe to
+# re-run after a partial failure because MySQL DDL commits implicitly.
+from datetime import datetime
+
+MIGRATIONS = []
+
+
+def migration(version, description):
+    """Register a migration step."""
+    def wrap(fn):
+        MIGRATIONS.append((version, description, fn))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return fn
+    return wrap
+
+
+def latest_version():
+    return MIGRATIONS[-1][0] if MIGRATIONS else 0
+
+
+def current_version(cur):
+    """Return the highest applied version, or None if `schema_migrations` doesn't exist yet."""
+    try:
+        cur.execute("SELECT MAX(version) FROM schema_migrations")
+        row = cur.fetchone()
+    except Exception:
+        return None
+    return row[0] if row and row[0] is not None else 0
+
+
+def migrate(conn, cur, target=None):
+    """Apply pending migrations up to `target` (default: latest). Returns the versions applied."""
+    target = latest_version() if target is None else target
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INT PRIMARY KEY,
+        description VARCHAR(255) NOT NULL,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+    cur.execute("SELECT version FROM schema_migrations")
+    applied = {row[0] for row in cur.fetchall()}
+    conn.commit()
+
+    done = []
+    for version, description, fn in MIGRATIONS:
+        if version > target or version in applied:
+            continue
+        try:
+            fn(conn, cur)
+            cur.execute(
+                "INSERT INTO schema_migrations (version, description) VALUES (%s, %s)",
+                (version, description),
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        done.append(version)
+    return done
+
+
+# -- helpers -----------------------------------------------------------------
+def _column_exists(cur, table, column):
+    cur.execute(
+        "SELECT 1 FROM information_schema.columns "
+        "WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s",
+        (table, column),
+    )
+    return cur.fetchone() is not None
+
+
+def _index_exists(cur, table, index):
+    cur.execute(
+        "SELECT 1 FROM information_schema.statistics "
+        "WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s LIMIT 1",
+        (table, index),
+    )
+    return cur.fetchone() is not None
+
+
+def _fk_exists(cur, table, name):
+    cur.execute(
+        "SELECT 1 FROM information_schema.table_constraints "
+        "WHERE table_schema = DATABASE() AND table_name = %s AND constraint_name = %s "
+        "AND constraint_type = 'FOREIGN KEY'",
+        (table, name),
+    )
+    return cur.fetchone() is not None
+
+
+def add_column(cur, table, column, ddl):
+    if not _column_exists(cur, table, column):
+        cur.execute(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
+
+
+def add_index(cur, table, index, columns, unique=False):
+    if not _index_exists(cur, table, index):
+        kind = "UNIQUE INDEX" if unique else "INDEX"
+        cur.execute(f"ALTER TABLE {table} ADD {kind} {index} ({columns})")
+
+
+def drop_index(cur, table, index):
+    if _index_exists(cur, table, index):
+        cur.execute(f"ALTER TABLE {table} DROP INDEX {index}")
+
+
+def add_foreign_key(cur, table, name, column, ref, on_delete):
+    if not _fk_exists(cur, table, name):
+        cur.execute(
+            f"ALTER TABLE {table} ADD CONSTRAINT {name} FOREIGN KEY ({column}) "
+            f"REFERENCES {ref} ON DELETE {on_delete}"
+        )
+
+
+# -- migrations ----------------------------------------------------------------
+@migration(1, "baseline schema")
+def _baseline(conn, cur):
+    from database.db import DEFAULT_MERALCO_RATE
+
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS devices (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        name VARCHAR(255) NOT NULL,
+        watt_per_hour DOUBLE NOT NULL,
+        user_id INT NULL
+    )
+    """)
+
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS records (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        date VARCHAR(50) NOT NULL,
+        total_kwh DOUBLE,
+        total_cost DECIMAL(12,2)
+    )
+    """)
+
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS record_items (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        record_id INT,
+        device_name VARCHAR(255),
+        watt_per_hour DOUBLE,
+        duration_minutes DOUBLE,
+        kwh_used DOUBLE,
+        cost DECIMAL(12,2)
+    )
+    """)
+
+    # Users table
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS users (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        username VARCHAR(150) NOT NULL UNIQUE,
+        password_hash VARCHAR(255) NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        profile_pic VARCHAR(255) NULL,
+        bio TEXT NULL
+    )
+    """)
+
+    # Meralco rate history
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS meralco_rates (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        rate DOUBLE NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+
+    # Columns added after the first release; older databases may lack them.
+    add_column(cur, "devices", "user_id", "INT NULL")
+    add_column(cur, "records", "user_id", "INT NULL")
+    add_column(cur, "users", "profile_pic", "VARCHAR(255) NULL")
+    add_column(cur, "users", "bio", "TEXT NULL")
+
+    # Seed default rate if missing
+    cur.execute("SELECT 1 FROM meralco_rates LIMIT 1")
+    if not cur.fetchone():
+        cur.execute("INSERT INTO meralco_rates (rate) VALUES (%s)", (DEFAULT_MERALCO_RATE,))
+
+
+@migration(2, "indexes for records, record_items, devices and meralco_rates")
+def _hot_path_indexes(conn, cur):
+    # RecordsPage/ProfilePage: WHERE user_id = ? [AND date range] ORDER BY date,
+    # reading only the totals -> covering index (the PK rides along implicitly).
+    add_index(cur, "records", "idx_records_user_date", "user_id, date, total_kwh, total_cost")
+    # HomePage / ProfilePage joins from records to their items.
+    add_index(cur, "record_items", "idx_record_items_record", "record_id")
+    # DevicesPage lists by owner; UsagePage resolves wattage by name.
+    add_index(cur, "devices", "idx_devices_user_name", "user_id, name")
+    add_index(cur, "devices", "idx_devices_name", "name")
+    # get_current_rate(): ORDER BY created_at DESC LIMIT 1
+    add_index(cur, "meralco_rates", "idx_meralco_rates_created", "created_at")
+
+
+@migration(3, "foreign keys for record_items.record_id and records.user_id")
+def _foreign_keys(conn, cur):
+    # Items whose record is gone can never be displayed; drop them so the
+    # constraint can be added.
+    cur.execute("""
+        DELETE ri FROM record_items ri
+        LEFT JOIN records r ON r.id = ri.record_id
+        WHERE ri.record_id IS NOT NULL AND r.id IS NULL
+    """)
+    cur.execute("""
+        UPDATE records r
+        LEFT JOIN users u ON u.id = r.user_id
+        SET r.user_id = NULL
+        WHERE r.user_id IS NOT NULL AND u.id IS NULL
+    """)
+    conn.commit()
+    add_foreign_key(cur, "record_items", "fk_record_items_record", "record_id",
+                    "records (id)", "CASCADE")
+    add_foreign_key(cur, "records", "fk_records_user", "user_id",
+                    "users (id)", "SET NULL")
+
+
+def _parse_legacy_date(value):
+    """Parse the VARCHAR dates written by older builds ('YYYY-MM-DD HH:MM:SS' and variants)."""
+    if isinstance(value, datetime):
+        return value
+    text = (value.decode() if isinstance(value, (bytes, bytearray)) else str(value or "")).strip()
+    try:
+        return datetime.fromisoformat(text)
+    except ValueError:
+        pass
+    for fmt in ("%Y-%m-%d %H:%M", "%Y/%m/%d %H:%M:%S", "%Y/%m/%d", "%m/%d/%Y"):
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+@migration(4, "records.date as DATETIME")
+def _records_date_datetime(conn, cur, chunk_size=1000):
+    cur.execute(
+        "SELECT data_type FROM information_schema.columns "
+        "WHERE table_schema = DATABASE() AND table_name = 'records' AND column_name = 'date'"
+    )
+    row = cur.fetchone()
+    if row and str(row[0]).lower() == "datetime":
+        return
+
+    add_column(cur, "records", "date_dt", "DATETIME NULL")
+
+    # Backfill in id-ordered chunks, one CASE UPDATE per chunk, so large
+    # tables never sit in a single long transaction.
+    unparsed = 0
+    last_id = 0
+    while True:
+        cur.execute(
+            "SELECT id, date FROM records WHERE id > %s AND date_dt IS NULL ORDER BY id LIMIT %s",
+            (last_id, chunk_size),
+        )
+        rows = cur.fetchall()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        params = []
+        for rec_id, raw in rows:
+            parsed = _parse_legacy_date(raw)
+            if parsed is None:
+                unparsed += 1
+                parsed = datetime(1970, 1, 1)
+            params.extend((rec_id, parsed))
+        ids = [r[0] for r in rows]
+        cur.execute(
+            "UPDATE records SET date_dt = CASE id "
+            + " ".join("WHEN %s THEN %s" for _ in rows)
+            + " END WHERE id IN (" + ", ".join(["%s"] * len(ids)) + ")",
+            tuple(params) + tuple(ids),
+        )
+        conn.commit()
+    if unparsed:
+        print(f"[migrations] {unparsed} record date(s) could not be parsed and were set to 1970-01-01; "
+              "the original text is kept in records.date_legacy")
+
+    # The text column is kept (nullable, as date_legacy) rather than dropped,
+    # so dates the parser didn't understand can still be fixed by hand.
+    drop_index(cur, "records", "idx_records_user_date")
+    cur.execute("ALTER TABLE records CHANGE date date_legacy VARCHAR(50) NULL, "
+                "CHANGE date_dt date DATETIME NOT NULL")
+    add_index(cur, "records", "idx_records_user_date", "user_id, date, total_kwh, total_cost")
+
+
+@migration(5, "tariff tables")
+def _tariffs(conn, cur):
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS tariffs (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        name VARCHAR(100) NOT NULL,
+        effective_from DATETIME NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        INDEX idx_tariffs_effective (effective_from)
+    )
+    """)
+    # kind: per_kwh (PHP/kWh), fixed (PHP/month), percent (% of running subtotal)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS tariff_components (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        tariff_id INT NOT NULL,
+        name VARCHAR(100) NOT NULL,
+        kind VARCHAR(16) NOT NULL,
+        amount DOUBLE NOT NULL,
+        sort_order INT NOT NULL DEFAULT 0,
+        CONSTRAINT fk_tariff_components_tariff FOREIGN KEY (tariff_id)
+            REFERENCES tariffs (id) ON DELETE CASCADE
+    )
+    """)
+    # kind: block (PHP/kWh surcharge inside the bracket), lifeline (% discount
+    # on energy charges when the month's kWh falls inside the bracket)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS tariff_tiers (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        tariff_id INT NOT NULL,
+        kind VARCHAR(16) NOT NULL,
+        lower_kwh DOUBLE NOT NULL,
+        upper_kwh DOUBLE NULL,
+        amount DOUBLE NOT NULL,
+        CONSTRAINT fk_tariff_tiers_tariff FOREIGN KEY (tariff_id)
+            REFERENCES tariffs (id) ON DELETE CASCADE
+    )
+    """)
+
+
+@migration(6, "usage_daily / usage_monthly rollup tables")
+def _usage_rollups(conn, cur):
+    # One row per (user, period, device); user_id 0 holds records saved while
+    # logged out (records.user_id IS NULL). Maintained by database/rollups.py.
+    for table, period in (("usage_daily", "day"), ("usage_monthly", "month")):
+        cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS {table} (
+            user_id INT NOT NULL,
+            {period} DATE NOT NULL,
+            device_name VARCHAR(255) NOT NULL,
+            minutes DOUBLE NOT NULL DEFAULT 0,
+            kwh DOUBLE NOT NULL DEFAULT 0,
+            cost DECIMAL(14,2) NOT NULL DEFAULT 0,
+            items INT NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, {period}, device_name)
+        )
+        """)
+    # Filled by migration 7 once the rows can be keyed by device id.
+
+
+@migration(7, "record_items.device_id, unique device names per owner")
+def _device_ids(conn, cur, chunk_size=10000):
+    # Names must be unique per owner for the (user_id, name) lookup. Rename
+    # later duplicates rather than delete them; their items keep their own
+    # name/wattage snapshots either way.
+    cur.execute("""
+    UPDATE devices d
+    JOIN devices k ON k.user_id <=> d.user_id AND k.name = d.name AND k.id < d.id
+    SET d.name = CONCAT(d.name, ' (', d.id, ')')
+    """)
+    conn.commit()
+    add_index(cur, "devices", "uq_devices_user_name", "user_id, name", unique=True)
+    drop_index(cur, "devices", "idx_devices_user_name")
+
+    add_column(cur, "record_items", "device_id", "INT NULL AFTER record_id")
+    add_index(cur, "record_items", "idx_record_items_device", "device_id")
+    add_foreign_key(cur, "record_items", "fk_record_items_device", "device_id",
+                    "devices (id)", "SET NULL")
+
+    # Backfill in id ranges: the record owner's own device first, then a
+    # shared device of the same name. Items matching neither stay NULL.
+    cur.execute("SELECT COALESCE(MIN(id), 0), COALESCE(MAX(id), 0) FROM record_items WHERE device_id IS NULL")
+    low, high = cur.fetchone()
+    for start in range(low, high + 1, chunk_size):
+        end = start + chunk_size - 1
+        cur.execute("""
+        UPDATE record_items ri
+        JOIN records r ON r.id = ri.record_id
+        JOIN devices d ON d.user_id = r.user_id AND d.name = ri.device_name
+        SET ri.device_id = d.id
+        WHERE ri.device_id IS NULL AND ri.id BETWEEN %s AND %s
+        """, (start, end))
+        cur.execute("""
+        UPDATE record_items ri
+        JOIN devices d ON d.user_id IS NULL AND d.name = ri.device_name
+        SET ri.device_id = d.id
+        WHERE ri.device_id IS NULL AND ri.id BETWEEN %s AND %s
+        """, (start, end))
+        conn.commit()
+
+    # Key the rollups by device id (0 = item not linked to a device); the
+    # name stays in the key as the snapshot for unlinked items.
+    for table, period in (("usage_daily", "day"), ("usage_monthly", "month")):
+        if not _column_exists(cur, table, "device_id"):
+            cur.execute(
+                f"ALTER TABLE {table} ADD COLUMN device_id INT NOT NULL DEFAULT 0 AFTER {period}, "
+                f"DROP PRIMARY KEY, ADD PRIMARY KEY (user_id, {period}, device_id, device_name)"
+            )
+    conn.commit()
+    from database.rollups import rebuild_with
+    rebuild_with(conn, cur)
+
+
+@migration(8, "unique shared device names")
+def _shared_device_names(conn, cur):
+    # UNIQUE (user_id, name) lets any number of shared (NULL-owner) rows share
+    # a name. Index the owner as COALESCE(user_id, 0) instead, after renaming
+    # shared duplicates created since migration 7 the same way it did.
+    cur.execute("""
+    UPDATE devices d
+    JOIN devices k ON k.user_id IS NULL AND k.name = d.name AND k.id < d.id
+    SET d.name = CONCAT(d.name, ' (', d.id, ')')
+    WHERE d.user_id IS NULL
+    """)
+    conn.commit()
+    add_column(cur, "devices", "owner_key", "INT AS (COALESCE(user_id, 0)) STORED")
+    add_index(cur, "devices", "uq_devices_owner_name", "owner_key, name", unique=True)
@@ -0,0 +1,44 @@
+# Half-open datetime ranges for period filters on records.date.
+# Queries use `date >= start AND date < end` so MySQL can range-scan
+# idx_records_user_date instead of pattern-matching strings.
+from datetime import datetime, timedelta
+
+
+def month_range(when=None):
+    """Return (start, end) datetimes bounding the calendar month containing `when`."""
+    when = when or datetime.now()
+    start = datetime(when.year, when.month, 1)
+    if when.month == 12:
+        end = datetime(when.year + 1, 1, 1)
+    else:
+        end = datetime(when.year, when.month + 1, 1)
+    return start, end
+
+
+def quarter_range(when=None):
+    """Return (start, end) datetimes bounding the calendar quarter containing `when`."""
+    when = when or datetime.now()
+    first_month = (when.month - 1) // 3 * 3 + 1
+    start = datetime(when.year, first_month, 1)
+    if first_month == 10:
+        end = datetime(when.year + 1, 1, 1)
+    else:
+        end = datetime(when.year, first_month + 3, 1)
+    return start, end
+
+
+def day_range(first, last):
+    """Return (start, end) covering the whole days `first`..`last` inclusive.
+
+    Either bound may be None for an open-ended range.
+    """
+    start = datetime(first.year, first.month, first.day) if first else None
+    end = datetime(last.year, last.month, last.day) + timedelta(days=1) if last else None
+    return start, end
+
+
+def format_record_date(value, fmt="%Y-%m-%d %H:%M"):
+    """Display helper for records.date values (datetime, or legacy strings)."""
+    if isinstance(value, datetime):
+        return value.strftime(fmt)
+    return str(value) if value is not None else ""
@@ -0,0 +1,204 @@
+# Connection pool for the Killua-T database layer.
+# Hands out MySQL connections with checkout/checkin semantics and keeps one
+# long-lived connection bound to each thread that asks for it, so the Tk main
+# thread, background workers and scripts never share cursor state.
+import threading
+import time
+from contextlib import contextmanager
+
+
+class PoolTimeout(RuntimeError):
+    """Raised when no connection becomes available within the checkout timeout."""
+
+
+class ConnectionPool:
+    """A small thread-safe pool of DB-API connections.
+
+    `factory` is a zero-argument callable returning a new connection. At most
+    `size` connections are open at once; idle connections that have not been
+    used for `health_check_interval` seconds are pinged before being handed
+    out again and replaced if the server dropped them.
+    """
+
+    def __init__(self, factory, size=5, timeout=30.0, health_check_interval=30.0):
+        if size < 1:
+            raise ValueError("pool size must be at least 1")
+        self._factory = factory
+        self.size = int(size)
+        self.timeout = float(timeout)
+        self.health_check_interval = float(health_check_interval)
+
+        self._cond = threading.Condition()
+        self._idle = []          # [(conn, last_used)]
+        self._open = 0           # connections currently alive (idle + checked out)
+        self._last_used = {}     # id(conn) -> monotonic timestamp
+        self._thread_conns = {}  # thread ident -> (thread, conn)
+
+    # -- checkout / checkin -------------------------------------------------
+    def checkout(self, timeout=None):
+        """Take a connection out of the pool, opening a new one if allowed."""
+        deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+        with self._cond:
+            while True:
+                if self._idle:
+                    conn, _ = self._idle.pop()
+                    break
+                if self._open < self.size:
+                    self._open += 1
+                    conn = None
+                    break
+                if self._reclaim_dead_threads():
+                    continue
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolTimeout(f"no database connection available after {self.timeout:.0f}s "
+                                      f"(pool size {self.size})")
+                self._cond.wait(remaining)
+
+        if conn is None:
+            try:
+                conn = self._factory()
+            except Exception:
+                with self._cond:
+                    self._open -= 1
+                    self._cond.notify()
+                raise
+        else:
+            conn = self._ensure_healthy(conn)
+        self._touch(conn)
+        return conn
+
+    def checkin(self, conn):
+        """Return a connection to the pool, rolling back any open transaction."""
+        try:
+            if getattr(conn, "in_transaction", False):
+                conn.rollback()
+        except Exception:
+            self._discard(conn)
+            return
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """Context manager around checkout()/checkin()."""
+        conn = self.checkout(timeout)
+        try:
+            yield conn
+        finally:
+            self.checkin(conn)
+
+    # -- per-thread connections --------------------------------------------
+    def thread_connection(self):
+        """Return the connection bound to the calling thread, checking one out on first use."""
+        thread = threading.current_thread()
+        with self._cond:
+            entry = self._thread_conns.get(thread.ident)
+        if entry is not None and entry[0] is thread:
+            conn = entry[1]
+            if time.monotonic() - self._last_used.get(id(conn), 0.0) > self.health_check_interval:
+                healthy = self._ensure_healthy(conn)
+                if healthy is not conn:
+                    with self._cond:
+                        self._thread_conns[thread.ident] = (thread, healthy)
+                    conn = healthy
+            self._touch(conn)
+            return conn
+        if entry is not None:
+            # The ident was reused: the connection belongs to a thread that
+            # has finished, so return it to the pool before rebinding
+            with self._cond:
+                if self._thread_conns.get(thread.ident) is entry:
+                    del self._thread_conns[thread.ident]
+                else:
+                    entry = None  # reclaimed meanwhile by _reclaim_dead_threads
+            if entry is not None:
+                self.checkin(entry[1])
+
+        conn = self.checkout()
+        with self._cond:
+            self._thread_conns[thread.ident] = (thread, conn)
+        return conn
+
+    def release_thread_connection(self):
+        """Give the calling thread's connection back to the pool (no-op if it has none)."""
+        with self._cond:
+            entry = self._thread_conns.pop(threading.get_ident(), None)
+        if entry is not None:
+            self.checkin(entry[1])
+
+    # -- maintenance ---------------------------------------------------------
+    def close_all(self):
+        """Close idle connections and those bound to threads. Checked-out connections are left alone."""
+        with self._cond:
+            conns = [c for c, _ in self._idle] + [c for _, c in self._thread_conns.values()]
+            self._idle.clear()
+            self._thread_conns.clear()
+            self._open -= len(conns)
+            self._cond.notify_all()
+        for conn in conns:
+            self._last_used.pop(id(conn), None)
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def stats(self):
+        """Return a snapshot of pool usage counters."""
+        with self._cond:
+            return {
+                "size": self.size,
+                "open": self._open,
+                "idle": len(self._idle),
+                "thread_bound": len(self._thread_conns),
+            }
+
+    # -- internals -----------------------------------------------------------
+    def _touch(self, conn):
+        self._last_used[id(conn)] = time.monotonic()
+
+    def _ensure_healthy(self, conn):
+        """Ping a connection that sat idle too long; replace it if it is dead."""
+        if time.monotonic() - self._last_used.get(id(conn), 0.0) <= self.health_check_interval:
+            return conn
+        try:
+            conn.ping(reconnect=True, attempts=1, delay=0)
+            return conn
+        except Exception:
+            pass
+        self._last_used.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+        try:
+            return self._factory()
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._cond.notify()
+            raise
+
+    def _discard(self, conn):
+        self._last_used.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._open -= 1
+            self._cond.notify()
+
+    def _reclaim_dead_threads(self):
+        """Move connections owned by finished threads back to the idle list. Caller holds the lock."""
+        dead = [ident for ident, (thread, _) in self._thread_conns.items() if not thread.is_alive()]
+        for ident in dead:
+            _, conn = self._thread_conns.pop(ident)
+            try:
+                if getattr(conn, "in_transaction", False):
+                    conn.rollback()
+            except Exception:
+                pass
+            self._idle.append((conn, time.monotonic()))
+        return bool(dead)
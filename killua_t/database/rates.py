@@ -0,0 +1,119 @@
+# Effective-date index over meralco_rates.
+# A rate applies from its created_at timestamp until the next one, so pricing a
+# usage item means finding the last rate at or before the item's record date.
+# The index keeps the history as two parallel sorted lists and answers that
+# with a binary search, so bulk re-pricing needs one query, not one per row.
+import threading
+import time
+from bisect import bisect_right
+from datetime import datetime
+
+
+class RateIndex:
+    """Sorted (timestamp, rate) history with as-of lookups."""
+
+    def __init__(self, history=(), default=None):
+        self._lock = threading.Lock()
+        self._times = []
+        self._rates = []
+        self.default = default
+        for ts, rate in history:
+            self.add(ts, rate)
+
+    def __len__(self):
+        return len(self._times)
+
+    def add(self, ts, rate):
+        """Insert one rate change, keeping the lists sorted."""
+        ts = _as_datetime(ts)
+        with self._lock:
+            i = bisect_right(self._times, ts)
+            self._times.insert(i, ts)
+            self._rates.insert(i, float(rate))
+
+    def rate_at(self, ts):
+        """Return the rate in force at `ts`.
+
+        Timestamps before the first recorded change use the earliest rate, so
+        records logged before any rate was entered are still priced.
+        """
+        ts = _as_datetime(ts)
+        with self._lock:
+            if not self._times:
+                return self.default
+            i = bisect_right(self._times, ts) - 1
+            return self._rates[max(i, 0)]
+
+    def rates_at(self, timestamps):
+        """Vector form of rate_at() for bulk pricing; returns a list aligned with `timestamps`."""
+        with self._lock:
+            times = self._times
+            rates = self._rates
+            if not times:
+                return [self.default] * len(timestamps)
+            out = []
+            for ts in timestamps:
+                i = bisect_right(times, _as_datetime(ts)) - 1
+                out.append(rates[max(i, 0)])
+            return out
+
+    def latest(self):
+        """Return (timestamp, rate) of the newest change, or None."""
+        with self._lock:
+            if not self._times:
+                return None
+            return self._times[-1], self._rates[-1]
+
+    def changes_since(self, ts):
+        """Return the (timestamp, rate) changes strictly after `ts`, oldest first."""
+        ts = _as_datetime(ts)
+        with self._lock:
+            i = bisect_right(self._times, ts)
+            return list(zip(self._times[i:], self._rates[i:]))
+
+
+def _as_datetime(value):
+    if isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(str(value))
+
+
+_index = None
+_loaded_at = 0.0
+_index_lock = threading.Lock()
+
+
+def get_rate_index(refresh=False):
+    """Return the process-wide RateIndex, loading the full history on first use.
+
+    Reloaded after KILLUA_RATE_CACHE_TTL seconds (as get_current_rate() is),
+    so rates added by another client are used for pricing too.
+    """
+    global _index, _loaded_at
+    from database.db import DEFAULT_MERALCO_RATE, RATE_CACHE_TTL, cursor
+    with _index_lock:
+        expired = RATE_CACHE_TTL > 0 and time.monotonic() - _loaded_at > RATE_CACHE_TTL
+        if _index is None or refresh or expired:
+            cursor.execute("SELECT created_at, rate FROM meralco_rates ORDER BY created_at ASC, id ASC")
+            _index = RateIndex(cursor.fetchall(), default=DEFAULT_MERALCO_RATE)
+            _loaded_at = time.monotonic()
+        return _index
+
+
+def loaded_rate_index():
+    """The RateIndex if it's loaded, else None. Never queries or waits on a
+    load, so it's safe on the Tk thread."""
+    return _index
+
+
+def note_rate_added(ts, rate):
+    """Fold a newly inserted rate into the loaded index (no-op if it isn't loaded yet)."""
+    with _index_lock:
+        index = _index
+    if index is not None:
+        index.add(ts, rate)
+
+
+def rate_at(ts):
+    """Shortcut for get_rate_index().rate_at(ts)."""
+    return get_rate_index().rate_at(ts)
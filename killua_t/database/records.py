@@ -0,0 +1,46 @@
+# Keyset-paginated access to a user's records, newest first.
+# Pages continue from the (date, id) of the last row already shown instead of
+# using OFFSET, so every page is a short range scan on idx_records_user_date
+# no matter how deep into the history the user has scrolled.
+import os
+
+from database import db
+
+PAGE_SIZE = int(os.getenv("KILLUA_RECORDS_PAGE_SIZE", 50))
+
+
+def fetch_records(user_id, since=None, until=None, after=None, limit=None):
+    """Return (rows, next_after) for one page of records dated in [since, until).
+
+    `rows` are (id, date, total_kwh, total_cost), newest first. `after` is the
+    `next_after` of the previous page (None for the first page); `next_after`
+    is None once there is nothing more to load.
+    """
+    limit = limit or PAGE_SIZE
+    if user_id:
+        clauses, params = ["user_id = ?"], [user_id]
+    else:
+        clauses, params = ["user_id IS NULL"], []
+    if since is not None:
+        clauses.append("date >= ?")
+        params.append(since)
+    if until is not None:
+        clauses.append("date < ?")
+        params.append(until)
+    if after is not None:
+        last_date, last_id = after
+        clauses.append("(date < ? OR (date = ? AND id < ?))")
+        params.extend((last_date, last_date, last_id))
+
+    cursor = db.cursor
+    cursor.execute(
+        "SELECT id, date, total_kwh, total_cost FROM records WHERE "
+        + " AND ".join(clauses)
+        + " ORDER BY date DESC, id DESC LIMIT ?",
+        tuple(params) + (limit + 1,),
+    )
+    rows = cursor.fetchall()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, (rows[-1][1], rows[-1][0])
@@ -0,0 +1,151 @@
+# Bulk re-pricing of stored usage after a rate change.
+# Walks the affected records in id order, a chunk at a time, re-prices their
+# items with the rate in force at each record's date (see database/rates.py)
+# and writes back only what changed, committing once per chunk. Memory use is
+# bounded by the chunk size regardless of how much history is re-priced.
+from datetime import datetime
+
+from core import energy
+from database import db, rollups
+from database.rates import get_rate_index
+
+
+class RepriceResult:
+    def __init__(self):
+        self.records = 0          # records examined
+        self.items = 0            # items examined
+        self.items_changed = 0
+        self.records_changed = 0
+        self.cancelled = False
+
+    def __repr__(self):
+        return (f"RepriceResult(records={self.records}, items={self.items}, "
+                f"items_changed={self.items_changed}, records_changed={self.records_changed}, "
+                f"cancelled={self.cancelled})")
+
+
+def _filters(since, until, user_id):
+    clauses = []
+    params = []
+    if since is not None:
+        clauses.append("date >= %s")
+        params.append(since)
+    if until is not None:
+        clauses.append("date < %s")
+        params.append(until)
+    if user_id is not None:
+        clauses.append("user_id = %s")
+        params.append(user_id)
+    return clauses, params
+
+
+def _case_update(cur, table, column, values):
+    """UPDATE `table` SET column = CASE id ... END for {id: value} in one statement."""
+    if not values:
+        return
+    ids = list(values)
+    params = []
+    for row_id in ids:
+        params.extend((row_id, values[row_id]))
+    cur.execute(
+        f"UPDATE {table} SET {column} = CASE id "
+        + " ".join("WHEN %s THEN %s" for _ in ids)
+        + " END WHERE id IN (" + ", ".join(["%s"] * len(ids)) + ")",
+        tuple(params) + tuple(ids),
+    )
+
+
+def reprice(since=None, until=None, user_id=None, chunk_size=500, progress=None,
+            should_cancel=None, index=None):
+    """Recompute record_items.cost and records.total_cost for records dated in [since, until).
+
+    `progress(done, total)` is called after each committed chunk;
+    `should_cancel()` is checked between chunks. Returns a RepriceResult.
+    """
+    index = index or get_rate_index()
+    result = RepriceResult()
+    clauses, params = _filters(since, until, user_id)
+    where = (" AND " + " AND ".join(clauses)) if clauses else ""
+
+    with db.connection() as (conn, cur):
+        cur.execute("SELECT COUNT(*) FROM records WHERE 1 = 1" + where, tuple(params))
+        total = cur.fetchone()[0] or 0
+        conn.commit()
+
+        last_id = 0
+        while True:
+            if should_cancel is not None and should_cancel():
+                result.cancelled = True
+                break
+            cur.execute(
+                "SELECT id, date, total_cost, user_id FROM records WHERE id > %s" + where + " ORDER BY id LIMIT %s",
+                (last_id,) + tuple(params) + (int(chunk_size),),
+            )
+            records = cur.fetchall()
+            if not records:
+                break
+            last_id = records[-1][0]
+
+            rate_by_record = dict(zip(
+                (r[0] for r in records),
+                index.rates_at([r[1] if isinstance(r[1], datetime) else str(r[1]) for r in records]),
+            ))
+            ids = list(rate_by_record)
+            cur.execute(
+                "SELECT id, record_id, kwh_used, cost, device_id, device_name FROM record_items WHERE record_id IN ("
+                + ", ".join(["%s"] * len(ids)) + ")",
+                tuple(ids),
+            )
+            items = cur.fetchall()
+
+            priced = energy.price_kwh(
+                [item[2] for item in items],
+                [rate_by_record[item[1]] for item in items],
+                ndigits=2,
+            )
+            totals = energy.sum_by([item[1] for item in items], priced.cost)
+            record_keys = {r[0]: (r[3], r[1]) for r in records}  # id -> (user_id, date)
+            new_item_costs = {}
+            rollup_deltas = {}
+            for (item_id, record_id, _, cost, device_id, device_name), new_cost in zip(items, priced.cost):
+                if cost is None or round(float(cost), 2) != new_cost:
+                    new_item_costs[item_id] = new_cost
+                    key = record_keys[record_id] + (device_id, device_name)
+                    delta = rollup_deltas.setdefault(key, [0.0, 0.0, 0.0, 0])
+                    delta[2] += new_cost - float(cost or 0)
+
+            new_record_totals = {}
+            for record_id, _, total_cost, _ in records:
+                if record_id not in totals:
+                    continue
+                new_total = round(totals[record_id], 2)
+                if total_cost is None or round(float(total_cost), 2) != new_total:
+                    new_record_totals[record_id] = new_total
+
+            try:
+                _case_update(cur, "record_items", "cost", new_item_costs)
+                _case_update(cur, "records", "total_cost", new_record_totals)
+                rollups.apply_deltas(cur, rollup_deltas)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+            result.records += len(records)
+            result.items += len(items)
+            result.items_changed += len(new_item_costs)
+            result.records_changed += len(new_record_totals)
+            if progress is not None:
+                progress(result.records, total)
+    return result
+
+
+def reprice_for_rate_change(effective_at, **kwargs):
+    """Re-price records covered by a rate that took effect at `effective_at`.
+
+    Only records up to the next recorded change are affected.
+    """
+    index = kwargs.pop("index", None) or get_rate_index()
+    later = [ts for ts, _ in index.changes_since(effective_at)]
+    until = later[0] if later else None
+    return reprice(since=effective_at, until=until, index=index, **kwargs)
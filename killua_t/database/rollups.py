@@ -0,0 +1,247 @@
+# Pre-aggregated usage: usage_daily and usage_monthly hold per-(user, period,
+# device id, device name) sums of record_items, so the profile and chart queries read a few
+# rows instead of scanning the full item history.
+#
+# Writers keep them current inside their own transaction: confirm_day adds a
+# record with apply_items(..., sign=1), delete_record subtracts it with
+# remove_record() before deleting, and re-pricing applies cost deltas with
+# apply_deltas(). Device id 0 marks items not linked to a device; the name is
+# the item's snapshot. rebuild() recomputes them from records/record_items (see
+# scripts/rebuild_rollups.py).
+from datetime import date, datetime, timedelta
+
+from database import db
+
+NO_USER = 0  # rollup key for records with user_id IS NULL
+
+# Chart bucket sizes; usage_series() picks one from the length of the range.
+DAY, WEEK, MONTH = "day", "week", "month"
+MAX_DAY_BUCKET_SPAN = 92     # days: up to a quarter plots per day
+MAX_WEEK_BUCKET_SPAN = 731   # days: up to two years plots per week
+
+_TABLES = (("usage_daily", "day"), ("usage_monthly", "month"))
+
+
+def _day(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.fromisoformat(str(value)).date()
+
+
+def _keys(user_id, when):
+    day = _day(when)
+    return user_id or NO_USER, day, day.replace(day=1)
+
+
+def apply_deltas(cur, deltas):
+    """Add {(user_id, when, device_id, device_name): (minutes, kwh, cost, items)} to both tables.
+
+    Rows whose item count drops to zero are removed.
+    """
+    if not deltas:
+        return
+    merged = {}
+    for (user_id, when, device_id, device_name), values in deltas.items():
+        uid, day, month = _keys(user_id, when)
+        for table, period in ((0, day), (1, month)):
+            key = (table, uid, period, device_id or 0, device_name)
+            acc = merged.setdefault(key, [0.0, 0.0, 0.0, 0])
+            for i, v in enumerate(values):
+                acc[i] += v
+    for t, (table, period_col) in enumerate(_TABLES):
+        rows = [(uid, period, dev, name, m, k, round(c, 2), n)
+                for (tbl, uid, period, dev, name), (m, k, c, n) in merged.items() if tbl == t]
+        if not rows:
+            continue
+        for i in range(0, len(rows), db.INSERT_CHUNK_SIZE):
+            chunk = rows[i:i + db.INSERT_CHUNK_SIZE]
+            cur.execute(
+                f"INSERT INTO {table} (user_id, {period_col}, device_id, device_name, minutes, kwh, cost, items) VALUES "
+                + ", ".join(["(?, ?, ?, ?, ?, ?, ?, ?)"] * len(chunk))
+                + " ON DUPLICATE KEY UPDATE minutes = minutes + VALUES(minutes), kwh = kwh + VALUES(kwh), "
+                "cost = cost + VALUES(cost), items = items + VALUES(items)",
+                tuple(v for row in chunk for v in row),
+            )
+        emptied = [(uid, period, dev, name) for uid, period, dev, name, *_, n in rows if n < 0]
+        if emptied:
+            cur.execute(
+                f"DELETE FROM {table} WHERE items <= 0 AND (user_id, {period_col}, device_id, device_name) IN ("
+                + ", ".join(["(?, ?, ?, ?)"] * len(emptied)) + ")",
+                tuple(v for key in emptied for v in key),
+            )
+
+
+def apply_items(cur, user_id, when, items, sign=1):
+    """Fold one record's items [(device_id, device_name, minutes, kwh, cost)] into the rollups."""
+    deltas = {}
+    for device_id, device_name, minutes, kwh, cost in items:
+        acc = deltas.setdefault((user_id, when, device_id, device_name), [0.0, 0.0, 0.0, 0])
+        acc[0] += sign * float(minutes or 0)
+        acc[1] += sign * float(kwh or 0)
+        acc[2] += sign * float(cost or 0)
+        acc[3] += sign
+    apply_deltas(cur, deltas)
+
+
+def remove_record(cur, record_id):
+    """Subtract a record's items from the rollups (call before deleting it)."""
+    cur.execute("SELECT user_id, date FROM records WHERE id = ?", (record_id,))
+    row = cur.fetchone()
+    if row is None:
+        return
+    cur.execute(
+        "SELECT device_id, device_name, duration_minutes, kwh_used, cost FROM record_items WHERE record_id = ?",
+        (record_id,),
+    )
+    apply_items(cur, row[0], row[1], cur.fetchall(), sign=-1)
+
+
+def forget_device(cur, device_id):
+    """Move a device's rollup rows to device id 0 (call before deleting the device;
+    its items keep their name snapshots and lose the link)."""
+    for table, period in _TABLES:
+        cur.execute(
+            f"INSERT INTO {table} (user_id, {period}, device_id, device_name, minutes, kwh, cost, items) "
+            f"SELECT user_id, {period}, 0, device_name, minutes, kwh, cost, items FROM {table} WHERE device_id = ? "
+            "ON DUPLICATE KEY UPDATE minutes = minutes + VALUES(minutes), kwh = kwh + VALUES(kwh), "
+            "cost = cost + VALUES(cost), items = items + VALUES(items)",
+            (device_id,),
+        )
+        cur.execute(f"DELETE FROM {table} WHERE device_id = ?", (device_id,))
+
+
+def rebuild_with(conn, cur, user_id=None):
+    """Recompute the rollups (for one user, or everyone) from records/record_items.
+
+    `user_id` NO_USER rebuilds the rows of records saved while logged out.
+    """
+    key_where, key_params = "", ()
+    item_where, item_params = "", ()
+    if user_id is not None:
+        key_where, key_params = " WHERE user_id = %s", (user_id,)
+        if user_id == NO_USER:
+            item_where = " WHERE r.user_id IS NULL"
+        else:
+            item_where, item_params = " WHERE r.user_id = %s", (user_id,)
+    for table, _ in _TABLES:
+        cur.execute(f"DELETE FROM {table}" + key_where, key_params)
+    cur.execute(
+        "INSERT INTO usage_daily (user_id, day, device_id, device_name, minutes, kwh, cost, items) "
+        f"SELECT COALESCE(r.user_id, {NO_USER}), DATE(r.date), COALESCE(ri.device_id, 0), ri.device_name, "
+        "SUM(COALESCE(ri.duration_minutes, 0)), SUM(COALESCE(ri.kwh_used, 0)), SUM(COALESCE(ri.cost, 0)), COUNT(*) "
+        "FROM record_items ri JOIN records r ON ri.record_id = r.id"
+        + item_where
+        + f" GROUP BY COALESCE(r.user_id, {NO_USER}), DATE(r.date), COALESCE(ri.device_id, 0), ri.device_name",
+        item_params,
+    )
+    cur.execute(
+        "INSERT INTO usage_monthly (user_id, month, device_id, device_name, minutes, kwh, cost, items) "
+        "SELECT user_id, DATE_SUB(day, INTERVAL DAYOFMONTH(day) - 1 DAY) AS month, device_id, device_name, "
+        "SUM(minutes), SUM(kwh), SUM(cost), SUM(items) FROM usage_daily"
+        + key_where
+        + " GROUP BY user_id, month, device_id, device_name",
+        key_params,
+    )
+    conn.commit()
+
+
+def rebuild(user_id=None):
+    with db.connection() as (conn, cur):
+        try:
+            rebuild_with(conn, cur, user_id)
+        except Exception:
+            conn.rollback()
+            raise
+
+
+# -- readers -------------------------------------------------------------------
+def month_totals(user_id, month_start):
+    """Return (kwh, cost) for the user's month starting at `month_start`."""
+    cursor = db.cursor
+    cursor.execute(
+        "SELECT SUM(kwh), SUM(cost) FROM usage_monthly WHERE user_id = ? AND month = ?",
+        (user_id or NO_USER, _day(month_start)),
+    )
+    row = cursor.fetchone()
+    return float(row[0] or 0.0), float(row[1] or 0.0)
+
+
+def lifetime_kwh(user_id):
+    cursor = db.cursor
+    cursor.execute("SELECT SUM(kwh) FROM usage_monthly WHERE user_id = ?", (user_id or NO_USER,))
+    return float(cursor.fetchone()[0] or 0.0)
+
+
+def top_devices(user_id, limit=5):
+    """Return [(device_name, minutes, kwh, cost)] ordered by total minutes, most used first.
+
+    Linked items are grouped by device id under the device's current name;
+    unlinked ones (device id 0) by their name snapshot.
+    """
+    cursor = db.cursor
+    cursor.execute(
+        "SELECT COALESCE(MAX(d.name), MAX(u.device_name)), SUM(u.minutes) AS total_minutes, SUM(u.kwh), SUM(u.cost) "
+        "FROM usage_monthly u LEFT JOIN devices d ON d.id = u.device_id "
+        "WHERE u.user_id = ? "
+        "GROUP BY u.device_id, CASE WHEN u.device_id = 0 THEN u.device_name ELSE '' END "
+        "ORDER BY total_minutes DESC LIMIT ?",
+        (user_id or NO_USER, int(limit)),
+    )
+    return cursor.fetchall()
+
+
+def pick_bucket(since, until):
+    span = (until - since).days
+    if span <= MAX_DAY_BUCKET_SPAN:
+        return DAY
+    if span <= MAX_WEEK_BUCKET_SPAN:
+        return WEEK
+    return MONTH
+
+
+def _day_ceil(value):
+    """First whole day at or after `value` (exclusive upper bound for DATE columns)."""
+    day = _day(value)
+    if isinstance(value, datetime) and value.time() != datetime.min.time():
+        day += timedelta(days=1)
+    return day
+
+
+def usage_series(user_id, since=None, until=None):
+    """Return (bucket, [(bucket_start, kwh)]) of the user's usage in [since, until).
+
+    The bucket (DAY, WEEK starting Monday, or MONTH) is chosen from the range;
+    an open bound is taken from the user's first/last day of usage.
+    """
+    uid = user_id or NO_USER
+    cursor = db.cursor
+    if since is None or until is None:
+        cursor.execute("SELECT MIN(day), MAX(day) FROM usage_daily WHERE user_id = ?", (uid,))
+        first, last = cursor.fetchone()
+        if first is None:
+            return DAY, []
+        since = since or first
+        until = until or _day(last) + timedelta(days=1)
+    since, until = _day(since), _day_ceil(until)
+    bucket = pick_bucket(since, until)
+    if bucket == MONTH:
+        cursor.execute(
+            "SELECT month, SUM(kwh) FROM usage_monthly WHERE user_id = ? AND month >= ? AND month < ? "
+            "GROUP BY month ORDER BY month",
+            (uid, since.replace(day=1), until),
+        )
+    elif bucket == WEEK:
+        cursor.execute(
+            "SELECT DATE_SUB(day, INTERVAL WEEKDAY(day) DAY) AS week, SUM(kwh) FROM usage_daily "
+            "WHERE user_id = ? AND day >= ? AND day < ? GROUP BY week ORDER BY week",
+            (uid, since, until),
+        )
+    else:
+        cursor.execute(
+            "SELECT day, SUM(kwh) FROM usage_daily WHERE user_id = ? AND day >= ? AND day < ? "
+            "GROUP BY day ORDER BY day",
+            (uid, since, until),
+        )
+    return bucket, [(_day(period), float(kwh or 0.0)) for period, kwh in cursor.fetchall()]
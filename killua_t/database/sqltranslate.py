@@ -0,0 +1,121 @@
+# SQLite-style `?` placeholder translation for mysql.connector.
+# The app writes queries with `?` placeholders; mysql.connector expects `%s`
+# and substitutes *every* `%s` in the statement text, including ones that
+# appear inside string constants. This module tokenizes the statement once,
+# respecting quoted strings, quoted identifiers and comments, and caches the
+# result by SQL text:
+#   - `?` (and existing `%s`) outside literals become `%s` placeholders;
+#   - string constants that contain `%` are lifted out into bound parameters
+#     so they reach the server byte-for-byte (e.g. LIKE 'a%', DATE_FORMAT
+#     patterns). Not for server-side prepared statements: the prepared
+#     cursor leaves quoted text alone, and lifting would turn a literal that
+#     appears twice (e.g. in SELECT and GROUP BY) into two parameters the
+#     server no longer sees as the same expression;
+#   - everything inside literals and comments is left untouched.
+import os
+from functools import lru_cache
+
+TRANSLATE_CACHE_SIZE = int(os.getenv("KILLUA_SQL_CACHE_SIZE", 512))
+
+
+class Translated:
+    """A translated statement plus the literals lifted out of it.
+
+    `lifted` holds (slot, value) pairs: `slot` is the placeholder position the
+    literal now occupies among all placeholders in `sql`.
+    """
+
+    __slots__ = ("sql", "placeholders", "lifted")
+
+    def __init__(self, sql, placeholders, lifted):
+        self.sql = sql
+        self.placeholders = placeholders
+        self.lifted = lifted
+
+    def bind(self, params):
+        """Merge caller params with lifted literals in placeholder order."""
+        if not self.lifted:
+            return params
+        params = list(params)
+        out = []
+        lifted = dict(self.lifted)
+        it = iter(params)
+        for slot in range(self.placeholders):
+            if slot in lifted:
+                out.append(lifted[slot])
+            else:
+                out.append(next(it))
+        return tuple(out)
+
+
+def _read_quoted(sql, i, quote):
+    """Return (end_index, unescaped_value) for a quoted token starting at sql[i] == quote."""
+    n = len(sql)
+    j = i + 1
+    chars = []
+    while j < n:
+        c = sql[j]
+        if c == "\\" and quote != "`" and j + 1 < n:
+            nxt = sql[j + 1]
+            chars.append({"n": "\n", "t": "\t", "r": "\r", "0": "\0", "Z": "\x1a"}.get(nxt, nxt))
+            j += 2
+            continue
+        if c == quote:
+            if j + 1 < n and sql[j + 1] == quote:  # doubled quote escape
+                chars.append(quote)
+                j += 2
+                continue
+            return j + 1, "".join(chars)
+        chars.append(c)
+        j += 1
+    return n, "".join(chars)  # unterminated: let the server report it
+
+
+@lru_cache(maxsize=TRANSLATE_CACHE_SIZE)
+def translate(sql, lift_literals=True):
+    """Tokenize `sql` and return a Translated with `%s` placeholders.
+
+    With `lift_literals=False`, string constants stay inline in the text.
+    """
+    out = []
+    lifted = []
+    placeholders = 0
+    n = len(sql)
+    i = 0
+    start = 0
+    while i < n:
+        c = sql[i]
+        if c in ("'", '"'):
+            end, value = _read_quoted(sql, i, c)
+            if lift_literals and "%" in sql[i:end]:
+                out.append(sql[start:i])
+                out.append("%s")
+                lifted.append((placeholders, value))
+                placeholders += 1
+                start = end
+            i = end
+        elif c == "`":
+            i, _ = _read_quoted(sql, i, c)
+        elif c == "#" or (sql.startswith("--", i) and (i + 2 == n or sql[i + 2] in " \t\r\n")):
+            nl = sql.find("\n", i)
+            i = n if nl < 0 else nl + 1
+        elif c == "/" and sql.startswith("/*", i):
+            close = sql.find("*/", i + 2)
+            i = n if close < 0 else close + 2
+        elif c == "?":
+            out.append(sql[start:i])
+            out.append("%s")
+            placeholders += 1
+            i += 1
+            start = i
+        elif c == "%" and sql.startswith("%s", i):
+            placeholders += 1
+            i += 2
+        else:
+            i += 1
+    out.append(sql[start:])
+    return Translated("".join(out), placeholders, tuple(lifted))
+
+
+def cache_info():
+    return translate.cache_info()
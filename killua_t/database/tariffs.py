@@ -0,0 +1,108 @@
+# Storage for tariffs (see core/tariff.py for the evaluator).
+# The tariff in force is loaded once and cached per effective date; saving a
+# tariff clears the cache.
+import threading
+from datetime import datetime
+
+from core.tariff import Component, Tariff, Tier
+from database import db
+from database import rollups
+from database.periods import month_range
+
+_lock = threading.Lock()
+_cache = {}  # effective tariff id -> Tariff
+_loaded = {"ids": None}  # [(effective_from, id)] sorted ascending
+
+
+def invalidate_tariff_cache():
+    with _lock:
+        _cache.clear()
+        _loaded["ids"] = None
+
+
+def _tariff_ids(cur):
+    with _lock:
+        ids = _loaded["ids"]
+    if ids is None:
+        cur.execute("SELECT effective_from, id FROM tariffs ORDER BY effective_from ASC, id ASC")
+        ids = list(cur.fetchall())
+        with _lock:
+            _loaded["ids"] = ids
+    return ids
+
+
+def _load(cur, tariff_id):
+    cur.execute("SELECT name, effective_from FROM tariffs WHERE id = ?", (tariff_id,))
+    row = cur.fetchone()
+    if not row:
+        return None
+    cur.execute(
+        "SELECT name, kind, amount FROM tariff_components WHERE tariff_id = ? ORDER BY sort_order, id",
+        (tariff_id,),
+    )
+    components = [Component(*r) for r in cur.fetchall()]
+    cur.execute(
+        "SELECT kind, lower_kwh, upper_kwh, amount FROM tariff_tiers WHERE tariff_id = ? ORDER BY lower_kwh",
+        (tariff_id,),
+    )
+    tiers = [Tier(*r) for r in cur.fetchall()]
+    return Tariff(row[0], components, tiers, effective_from=row[1], tariff_id=tariff_id)
+
+
+def get_active_tariff(when=None):
+    """Return the Tariff in force at `when` (default now), or None if none is defined."""
+    when = when or datetime.now()
+    cur = db.cursor
+    current = None
+    for effective_from, tariff_id in _tariff_ids(cur):
+        if effective_from <= when:
+            current = tariff_id
+        else:
+            break
+    if current is None:
+        return None
+    with _lock:
+        tariff = _cache.get(current)
+    if tariff is None:
+        tariff = _load(cur, current)
+        with _lock:
+            _cache[current] = tariff
+    return tariff
+
+
+def save_tariff(tariff):
+    """Insert a Tariff with its components and tiers; returns the new id."""
+    effective_from = tariff.effective_from or datetime.now().replace(microsecond=0)
+    with db.transaction() as cur:
+        cur.execute("INSERT INTO tariffs (name, effective_from) VALUES (?, ?)", (tariff.name, effective_from))
+        tariff_id = cur.lastrowid
+        db.insert_many(
+            cur, "tariff_components", ("tariff_id", "name", "kind", "amount", "sort_order"),
+            [(tariff_id, c.name, c.kind, c.amount, i) for i, c in enumerate(tariff.components)],
+        )
+        db.insert_many(
+            cur, "tariff_tiers", ("tariff_id", "kind", "lower_kwh", "upper_kwh", "amount"),
+            [(tariff_id, t.kind, t.lower_kwh, t.upper_kwh, t.amount) for t in tariff.tiers],
+        )
+    invalidate_tariff_cache()
+    return tariff_id
+
+
+def monthly_usage(user_id, when=None):
+    """Return (total_kwh, recorded_cost) for the user's records in the month containing `when`."""
+    start, _ = month_range(when)
+    return rollups.month_totals(user_id, start)
+
+
+def estimate_month(user_id, when=None):
+    """Return (kwh, cost, bill) for the month; `bill` is None when no tariff is configured.
+
+    With a tariff the cost is the tariff's bill for the month's total kWh;
+    otherwise it is the sum of the recorded (flat-rate) costs.
+    """
+    kwh, recorded = monthly_usage(user_id, when)
+    tariff = get_active_tariff(when)
+    if tariff is None:
+        return kwh, recorded, None
+    bill = tariff.bill(kwh)
+    return kwh, bill.total, bill
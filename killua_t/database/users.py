@@ -0,0 +1,11 @@
+# User account lookups. Rows are (id, username, bio, profile_pic), the shape
+# core.session.Session.from_row() expects.
+from database import db
+
+
+def find_login(username, pw_hash):
+    """Return the user row matching the credentials, or None."""
+    cursor = db.cursor
+    cursor.execute("SELECT id, username, bio, profile_pic FROM users WHERE username = ? AND password_hash = ?",
+                   (username, pw_hash))
+    return cursor.fetchone()
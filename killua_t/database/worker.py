@@ -0,0 +1,55 @@
+# Background executor for database work.
+# Tk event handlers submit their queries here instead of running them on the
+# main thread; each worker thread gets its own pooled connection through the
+# db.conn/db.cursor proxies. Returns concurrent.futures.Future objects, so the
+# same calls work from scripts (future.result()) and from the GUI (see
+# pages/tasks.py, which delivers results back to Tk with after()).
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from database import db
+
+# Leave room in the pool for the Tk thread and the schema bootstrap.
+DB_WORKERS = int(os.getenv("KILLUA_DB_WORKERS", max(1, db.DB_POOL_SIZE - 2)))
+
+_executor = None
+_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=DB_WORKERS, thread_name_prefix="killua-db")
+        return _executor
+
+
+def _run(fn, args, kwargs):
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        # End whatever transaction the task left open: a half-finished write
+        # after an error, or the read snapshot a SELECT opened under
+        # REPEATABLE READ. Otherwise this thread's connection would keep
+        # reading that snapshot and miss commits made on other workers.
+        # Writers commit before returning, so nothing they did is lost here.
+        try:
+            if db.conn.in_transaction:
+                db.conn.rollback()
+        except Exception:
+            pass
+
+
+def submit(fn, *args, **kwargs):
+    """Run `fn(*args, **kwargs)` on a DB worker thread and return its Future."""
+    return get_executor().submit(_run, fn, args, kwargs)
+
+
+def shutdown(wait=True):
+    """Stop the worker threads (their connections return to the pool as the threads exit)."""
+    global _executor
+    with _lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=wait, cancel_futures=True)
@@ -1,21 +1,57 @@
+import importlib
+import threading
+
 import customtkinter as ctk
-from pages.home import HomePage
-from pages.devices import DevicesPage
-from pages.usage import UsagePage
-from pages.records import RecordsPage
-from pages.meralco_rate import MeralcoRatePage
-from pages.login import LoginPage
-from pages.register import RegistrationPage
-from pages.profile import ProfilePage
+from core import events
+from core.device_catalog import DeviceCatalog
+from database.devices import fetch_devices
+from database.db import start_background_bootstrap
 
 ctk.set_appearance_mode("dark")
 ctk.set_default_color_theme("blue")
 
+# Page name -> module that defines it. Pages are imported and built on first
+# show_frame(); only the login screen is constructed at startup.
+PAGES = {
+    "LoginPage": "pages.login",
+    "RegistrationPage": "pages.register",
+    "HomePage": "pages.home",
+    "DevicesPage": "pages.devices",
+    "UsagePage": "pages.usage",
+    "RecordsPage": "pages.records",
+    "MeralcoRatePage": "pages.meralco_rate",
+    "ProfilePage": "pages.profile",
+}
+
+# Once the login screen is up, the remaining pages are built one per idle
+# slot, starting after this delay, so later navigation doesn't stall.
+WARM_DELAY_MS = 300
+
+# Imported on a daemon thread at startup: loading matplotlib takes long
+# enough to freeze the window, and importing needs no Tk calls.
+PRELOAD_MODULES = ("pages.charts",)
+
+# Avatar sizes: top-bar icon and the Profile page picture
+AVATAR_SMALL = (28, 28)
+AVATAR_LARGE = (180, 180)
+
+
+def _preload_modules():
+    for name in PRELOAD_MODULES:
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            print(f"[KilluaT] Preloading {name} failed: {e}")
+
 
 class KilluaT(ctk.CTk):
     def __init__(self):
         super().__init__()
 
+        # Check/upgrade the schema off the main thread while the window is built;
+        # the first query waits for it if it hasn't finished yet.
+        start_background_bootstrap()
+
         self.title("Killua-T Electricity Tracker")
         self.geometry("950x600")
 
@@ -25,24 +61,129 @@ class KilluaT(ctk.CTk):
         self.container.grid_rowconfigure(0, weight=1)
         self.container.grid_columnconfigure(0, weight=1)
 
-        # Track logged-in user
-        # `current_user_id` will be set after successful login/register
-        self.current_user_id = None
-        self.current_username = None
-        self._last_profile_pic = None  # Track previous profile_pic to detect changes
+        # Logged-in user (core.session.Session), set by login()
+        self.session = None
+        self._guest_devices = DeviceCatalog()  # shared devices, while nobody is logged in
+        events.subscribe(events.ProfileChanged, lambda e: self.refresh_avatar())
+        # Subscribed before any page is built, so the catalog is current by
+        # the time pages handle the same event
+        events.subscribe(events.DevicesChanged, lambda e: self.devices.apply(e))
 
-        # Initialize pages dict
+        # Pages built so far (see PAGES)
         self.frames = {}
-        for Page in (LoginPage, RegistrationPage, HomePage, DevicesPage, UsagePage, RecordsPage, MeralcoRatePage, ProfilePage):
-            frame = Page(parent=self.container, controller=self)
-            self.frames[Page.__name__] = frame
-            frame.grid(row=0, column=0, sticky="nsew")
+        self._visible_frame = None
+        self._avatar_small = None
+        self._avatar_large = None
 
         # Start at login screen
         self.show_frame("LoginPage")
+        threading.Thread(target=_preload_modules, name="killua-preload", daemon=True).start()
+        self._warm_queue = [lambda name=name: self.get_frame(name) for name in PAGES]
+        self.after(WARM_DELAY_MS, self._warm_next)
+
+    def get_frame(self, page_name):
+        """Return the page called `page_name`, importing and building it on first use."""
+        frame = self.frames.get(page_name)
+        if frame is None:
+            module = importlib.import_module(PAGES[page_name])
+            frame = getattr(module, page_name)(parent=self.container, controller=self)
+            self.frames[page_name] = frame
+            frame.grid(row=0, column=0, sticky="nsew")
+            self._apply_avatar(frame)
+            # Keep the page that is showing on top of the new one
+            if self._visible_frame is not None:
+                self._visible_frame.tkraise()
+        return frame
+
+    def _warm_next(self):
+        """Run one warm-up step, then yield to pending events before the next."""
+        if not self._warm_queue:
+            return
+        step = self._warm_queue.pop(0)
+        try:
+            step()
+        except Exception as e:
+            print(f"[KilluaT] Background page warm-up failed: {e}")
+        self.after_idle(lambda: self.after(1, self._warm_next))
+
+    def _apply_avatar(self, f):
+        """Put the current avatar images (or none) on a page's avatar labels."""
+        for attr, img in (("profile_pic_lbl", self._avatar_small), ("img_label", self._avatar_large)):
+            if hasattr(f, attr):
+                try:
+                    w = getattr(f, attr)
+                    # Clear old image completely using empty string
+                    w.configure(image="", text='')
+                    if img:
+                        w.configure(image=img, text='')
+                        w.image = img
+                except Exception as e:
+                    print(f"[KilluaT] Error setting {attr}: {e}")
+
+    @property
+    def current_user_id(self):
+        return self.session.user_id if self.session else None
+
+    @property
+    def current_username(self):
+        return self.session.username if self.session else None
+
+    @property
+    def devices(self):
+        """Device catalog of the logged-in user (shared devices only when logged out)."""
+        return self.session.devices if self.session else self._guest_devices
+
+    def load_devices(self, tasks, on_ready, on_error=None):
+        """Call `on_ready(catalog)` with the device catalog, fetching it through
+        `tasks` (a page's UiTasks) first if it isn't loaded yet."""
+        catalog = self.devices
+        if catalog.loaded:
+            on_ready(catalog)
+            return
+        generation = catalog.begin_load()
+
+        def loaded(rows):
+            catalog.replace(rows, generation)
+            on_ready(catalog)
+
+        tasks.run(fetch_devices, catalog.user_id, on_done=loaded, on_error=on_error)
+
+    def login(self, session):
+        """Start `session` (after login/registration) and go to the home page."""
+        self.session = session
+        self.refresh_avatar()
+        self.show_frame("HomePage")
+
+    def logout(self):
+        self.session = None
+        self._guest_devices.invalidate()
+        self.refresh_avatar()
+        self.show_frame("LoginPage")
+
+    def refresh_avatar(self):
+        """Re-apply the session's avatar to every page (after login or a picture change)."""
+        from pages.assets import load_image, create_placeholder_image
+
+        session = self.session
+        if session is None:
+            self._avatar_small = self._avatar_large = None
+        else:
+            load = lambda path, size: load_image(path, size=size, circle=True)
+            self._avatar_small = (session.avatar(AVATAR_SMALL, load)
+                                  or create_placeholder_image(size=AVATAR_SMALL, text=""))
+            self._avatar_large = (session.avatar(AVATAR_LARGE, load)
+                                  or create_placeholder_image(size=AVATAR_LARGE, text="No Image"))
+        for f in self.frames.values():
+            self._apply_avatar(f)
 
     def show_frame(self, page_name):
-        frame = self.frames[page_name]
+        frame = self.get_frame(page_name)
+        # Stop background loads for the page we're leaving; their results
+        # would only repaint widgets nobody can see.
+        previous = self._visible_frame
+        if previous is not None and previous is not frame and hasattr(previous, "tasks"):
+            previous.tasks.cancel_all()
+        self._visible_frame = frame
         frame.tkraise()
         # If the page defines an on_show hook, call it so pages can refresh their data
         if hasattr(frame, "on_show"):
@@ -50,93 +191,6 @@ class KilluaT(ctk.CTk):
                 frame.on_show()
             except Exception:
                 pass
-        # Load two sizes: a small avatar for top-bars and a large one
-        # for the Profile page. This prevents the small image from
-        # being applied to the large profile widget (causing it to look tiny).
-        try:
-            from pages.assets import load_image, create_placeholder_image, clear_placeholder_cache
-            
-            img_small = None
-            img_large = None
-            uid = getattr(self, 'current_user_id', None)
-            print(f"[show_frame] uid={uid}")
-            
-            if uid:
-                cursor = __import__('database.db', fromlist=['cursor']).cursor
-                cursor.execute("SELECT profile_pic FROM users WHERE id = ?", (uid,))
-                row = cursor.fetchone()
-                profile_pic = row[0] if row else None
-                print(f"[show_frame] profile_pic={repr(profile_pic)}")
-                
-                # Detect if profile_pic changed (e.g., from user with pic to user without)
-                profile_pic_changed = (profile_pic != self._last_profile_pic)
-                self._last_profile_pic = profile_pic
-                print(f"[show_frame] profile_pic_changed={profile_pic_changed}")
-                
-                # Clear placeholder cache if switching between users
-                if profile_pic_changed:
-                    clear_placeholder_cache()
-                    print(f"[show_frame] cleared placeholder cache")
-                
-                if profile_pic:
-                    try:
-                        img_small = load_image(profile_pic, size=(28, 28), circle=True)
-                        img_large = load_image(profile_pic, size=(180, 180), circle=True)
-                        print(f"[show_frame] loaded real images")
-                    except Exception as e:
-                        print(f"[show_frame] error loading real images: {e}")
-                        img_small = None
-                        img_large = None
-                else:
-                    # Get cached placeholder images (reuse, don't recreate)
-                    img_small = create_placeholder_image(size=(28, 28), text="")
-                    img_large = create_placeholder_image(size=(180, 180), text="No Image")
-                    print(f"[show_frame] created placeholder images")
-
-            # Only update images if they actually changed (profile_pic_changed=True or uid is None)
-            should_update_images = profile_pic_changed if uid else True
-            
-            if should_update_images:
-                print(f"[show_frame] updating images on all frames")
-                # Propagate or clear image on frames
-                for f in self.frames.values():
-                    # handle small top-bar avatar
-                    if hasattr(f, 'profile_pic_lbl'):
-                        try:
-                            w = f.profile_pic_lbl
-                            # Clear old image completely using empty string
-                            w.configure(image="", text='')
-                            # Don't delete the attribute - just let it be reassigned
-                            
-                            # Set new image
-                            if img_small:
-                                w.configure(image=img_small, text='')
-                                w.image = img_small
-                                print(f"[show_frame] set img_small on profile_pic_lbl")
-                            else:
-                                print(f"[show_frame] cleared profile_pic_lbl")
-                        except Exception as e:
-                            print(f"[show_frame] error with profile_pic_lbl: {e}")
-
-                    # handle large profile page avatar
-                    if hasattr(f, 'img_label'):
-                        try:
-                            w = f.img_label
-                            # Clear old image completely using empty string
-                            w.configure(image="", text='')
-                            # Don't delete the attribute - just let it be reassigned
-                            
-                            # Set new image
-                            if img_large:
-                                w.configure(image=img_large, text='')
-                                w.image = img_large
-                                print(f"[show_frame] set img_large on img_label")
-                            else:
-                                print(f"[show_frame] cleared img_label")
-                        except Exception as e:
-                            print(f"[show_frame] error with img_label: {e}")
-        except Exception as e:
-            print(f"[show_frame] outer exception: {e}")
 
 
 if __name__ == "__main__":
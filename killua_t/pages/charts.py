@@ -0,0 +1,88 @@
+import customtkinter as ctk
+import matplotlib.dates as mdates
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from matplotlib.figure import Figure
+
+
+class LineChart:
+    """Line + filled-area plot embedded once in `master` and updated in place.
+
+    The Figure, canvas and artists are created a single time; set_data()
+    swaps the data on the existing line/fill and schedules a redraw with
+    draw_idle(). Tick labels (and the tight_layout pass they need) are only
+    recomputed when the labels actually change.
+
+    With `date_axis=True`, x values are dates/datetimes placed on a real time
+    axis whose ticks come from matplotlib's AutoDateLocator.
+    """
+
+    MAX_MARKERS = 60  # beyond this many points the markers just blur the line
+
+    def __init__(self, master, color, xlabel, ylabel, figsize=(6, 4), fill_alpha=0.3,
+                 empty_text="No data to display", date_axis=False):
+        self.figure = Figure(figsize=figsize, dpi=100, facecolor="#212121", edgecolor="white")
+        self.ax = ax = self.figure.add_subplot(111)
+        ax.set_facecolor("#1a1a1a")
+        (self.line,) = ax.plot([], [], marker='o', linewidth=2, markersize=6, color=color)
+        self.fill = ax.fill_between([], [], alpha=fill_alpha, color=color)
+
+        ax.set_xlabel(xlabel, fontsize=12, color="white")
+        ax.set_ylabel(ylabel, fontsize=12, color="white")
+        ax.tick_params(axis='x', labelcolor='white')
+        ax.tick_params(axis='y', labelcolor='white')
+        ax.grid(True, alpha=0.2, color="white")
+        for spine in ax.spines.values():
+            spine.set_color("white")
+        self.date_axis = date_axis
+        if date_axis:
+            locator = mdates.AutoDateLocator()
+            ax.xaxis.set_major_locator(locator)
+            ax.xaxis.set_major_formatter(mdates.ConciseDateFormatter(locator))
+
+        self.canvas = FigureCanvasTkAgg(self.figure, master=master)
+        self.widget = self.canvas.get_tk_widget()
+        self.empty_label = ctk.CTkLabel(master, text=empty_text, text_color="gray", font=("Arial", 14))
+        self.x = []
+        self.y = []
+        self._labels = None
+        self._visible = None
+        self._laid_out = False
+
+    def _show(self, has_data):
+        if has_data == self._visible:
+            return
+        self._visible = has_data
+        if has_data:
+            self.empty_label.pack_forget()
+            self.widget.pack(fill="both", expand=True)
+        else:
+            self.widget.pack_forget()
+            self.empty_label.pack(expand=True)
+
+    def set_data(self, x, y, labels=None):
+        """Plot `y` against `x`; `labels` (optional) become the x tick labels, one per point."""
+        x = list(mdates.date2num(list(x))) if self.date_axis and x else list(x)
+        y = [float(v or 0) for v in y]
+        labels = list(labels) if labels is not None else None
+        self._show(bool(x))
+        if not x or (x == self.x and y == self.y and labels == self._labels):
+            return
+        self.x, self.y = x, y
+
+        self.line.set_data(x, y)
+        self.line.set_marker('o' if len(x) <= self.MAX_MARKERS else '')
+        self.fill.set_verts([[(x[0], 0.0)] + list(zip(x, y)) + [(x[-1], 0.0)]])
+        if labels is not None and labels != self._labels:
+            self._labels = labels
+            self.ax.set_xticks(x)
+            self.ax.set_xticklabels(labels, rotation=45, ha='right', fontsize=10, color="white")
+            self.figure.tight_layout()
+            self._laid_out = True
+        elif not self._laid_out:
+            self.figure.tight_layout()
+            self._laid_out = True
+        self.ax.relim()
+        self.ax.autoscale_view()
+        bottom, top = self.ax.get_ylim()
+        self.ax.set_ylim(min(bottom, 0.0), top)
+        self.canvas.draw_idle()
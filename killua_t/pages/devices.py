@@ -1,14 +1,22 @@
 import customtkinter as ctk
 from tkinter import messagebox
 from database.db import conn, cursor
+from database import rollups
+from core import events
 from .assets import get_logo
 from .sidebar import Sidebar
+from .tasks import UiTasks
+
+# MySQL ER_DUP_ENTRY: (user_id, name) is unique per owner
+DUPLICATE_NAME = 1062
 
 
 class DevicesPage(ctk.CTkFrame):
     def __init__(self, parent, controller):
         super().__init__(parent)
         self.controller = controller
+        self.tasks = UiTasks(self)
+        self.dirty = events.DirtyFlag(events.DevicesChanged)
         self.sidebar = None
         self.grid_rowconfigure(1, weight=1)
         self.grid_columnconfigure(0, weight=1)
@@ -58,8 +66,8 @@ class DevicesPage(ctk.CTkFrame):
         actions = ctk.CTkFrame(form, fg_color="transparent")
         actions.grid(row=2, column=1, pady=12)
 
-        add_btn = ctk.CTkButton(actions, text="Add Device", width=120, command=self.add_device, fg_color="#4CAF50", hover_color="#45a049")
-        add_btn.pack(side="left", padx=8)
+        self.add_btn = ctk.CTkButton(actions, text="Add Device", width=120, command=self.add_device, fg_color="#4CAF50", hover_color="#45a049")
+        self.add_btn.pack(side="left", padx=8)
 
         clear_btn = ctk.CTkButton(actions, text="Clear", width=100, command=self.clear_form)
         clear_btn.pack(side="left", padx=8)
@@ -70,8 +78,13 @@ class DevicesPage(ctk.CTkFrame):
         # Scrollable frame for device list
         self.device_list_frame = ctk.CTkScrollableFrame(body, width=700, height=240)
         self.device_list_frame.pack(pady=6, fill="both", expand=True)
-
-        self.refresh_devices()
+        # Row widgets by device id and the order they're packed in; refreshes
+        # diff against these instead of rebuilding the list
+        self._device_rows = {}
+        self._device_order = []
+        self._list_status = ctk.CTkLabel(self.device_list_frame, text="Loading devices...",
+                                         text_color="gray", font=("Arial", 13))
+        self._list_status.pack(pady=10)
 
     def clear_form(self):
         self.entry_name.delete(0, "end")
@@ -83,70 +96,118 @@ class DevicesPage(ctk.CTkFrame):
 
         if not name or not watt:
             return messagebox.showerror("Error", "Please fill all fields.")
+        try:
+            watt = float(watt)
+        except ValueError:
+            return messagebox.showerror("Error", "Wattage must be a valid number.")
 
         # associate device with current user (if any); allow NULL for shared devices
         user_id = self.controller.current_user_id
+        if self.controller.devices.find(user_id, name):
+            return messagebox.showerror("Error", "A device with that name already exists.")
+        self.add_btn.configure(state="disabled")
+        self.tasks.run(self._insert_device, name, watt, user_id,
+                       on_done=self._device_added, on_error=self._device_add_failed,
+                       cancel_on_hide=False)
+
+    def _insert_device(self, name, watt, user_id):
         cursor.execute("INSERT INTO devices (name, watt_per_hour, user_id) VALUES (?, ?, ?)",
-                   (name, float(watt), user_id))
+                   (name, watt, user_id))
         conn.commit()
+        return cursor.lastrowid, name, watt, user_id
 
+    def _device_added(self, device):
+        self.add_btn.configure(state="normal")
+        events.publish(events.DevicesChanged(self.controller.current_user_id, device[0], device))
         self.refresh_devices()
         self.clear_form()
 
-    def refresh_devices(self):
-        # Clear existing device items
-        for widget in self.device_list_frame.winfo_children():
-            widget.destroy()
+    def _device_add_failed(self, e):
+        self.add_btn.configure(state="normal")
+        if getattr(e, "errno", None) == DUPLICATE_NAME:
+            return messagebox.showerror("Error", "A device with that name already exists.")
+        messagebox.showerror("Error", f"Failed to add device: {e}")
 
-        # show devices for the current user and shared devices (user_id IS NULL)
+    def refresh_devices(self):
+        # show devices for the current user and shared devices (user_id IS NULL),
+        # straight from the session's device catalog once it's loaded
         user_id = self.controller.current_user_id
-        if user_id:
-            cursor.execute("SELECT id, name, watt_per_hour, user_id FROM devices WHERE user_id = ? OR user_id IS NULL", (user_id,))
-        else:
-            cursor.execute("SELECT id, name, watt_per_hour, user_id FROM devices WHERE user_id IS NULL")
-        rows = cursor.fetchall()
+        generation = self.dirty.begin(user_id)
 
-        for device_id, name, watt, owner_id in rows:
-            # Create a frame for each device
-            device_frame = ctk.CTkFrame(self.device_list_frame, fg_color="#2b2b2b")
-            device_frame.pack(fill="x", padx=5, pady=2)
+        def ready(catalog):
+            self._show_devices(catalog.rows(), user_id)
+            self.dirty.done(generation)
+
+        self.controller.load_devices(self.tasks, ready,
+                                     on_error=lambda e: print(f"[DevicesPage] Error loading devices: {e}"))
 
-            # Device info label
-            info_text = f"{name} — {watt} W"
-            if owner_id is None:
-                info_text += " (Shared)"
-            device_label = ctk.CTkLabel(device_frame, text=info_text, anchor="w", font=("Arial", 13))
-            device_label.pack(side="left", padx=10, pady=5, fill="x", expand=True)
+    def _show_devices(self, rows, user_id):
+        """Bring the list in line with `rows`, touching only rows that changed."""
+        new_order = [row[0] for row in rows]
+        keep = set(new_order)
+        for device_id in [d for d in self._device_rows if d not in keep]:
+            self._device_rows.pop(device_id).destroy()
+        old_prev = {device_id: prev for prev, device_id in zip([None] + self._device_order, self._device_order)}
 
+        prev = None
+        for device_id, name, watt, owner_id in rows:
+            row = self._device_rows.get(device_id)
+            if row is None:
+                row = self._device_rows[device_id] = self.create_device_row()
             # Show edit/delete buttons for user's own devices and shared devices
-            can_modify = (owner_id == user_id) or (owner_id is None)
-            
-            if can_modify:
-                # Edit button
-                edit_btn = ctk.CTkButton(
-                    device_frame,
-                    text="Edit",
-                    width=60,
-                    height=28,
-                    fg_color="#2196F3",
-                    hover_color="#1976D2",
-                    command=lambda d_id=device_id, d_name=name, d_watt=watt: self.edit_device(d_id, d_name, d_watt)
-                )
-                edit_btn.pack(side="right", padx=3, pady=5)
-
-                # Delete button (X)
-                delete_btn = ctk.CTkButton(
-                    device_frame,
-                    text="✕",
-                    width=40,
-                    height=28,
-                    fg_color="#f44336",
-                    hover_color="#d32f2f",
-                    command=lambda d_id=device_id, d_name=name: self.delete_device(d_id, d_name)
-                )
-                delete_btn.pack(side="right", padx=3, pady=5)
-
-    def edit_device(self, device_id, current_name, current_watt):
+            data = (name, watt, owner_id, owner_id == user_id or owner_id is None)
+            if row.data != data:
+                self.bind_device_row(row, device_id, *data)
+            if not row.winfo_manager() or old_prev.get(device_id, device_id) != prev:
+                # New, or its neighbour changed: (re)pack it right after the previous row
+                if prev is not None:
+                    row.pack(fill="x", padx=5, pady=2, after=self._device_rows[prev])
+                else:
+                    packed = self.device_list_frame.pack_slaves()
+                    if not packed:
+                        row.pack(fill="x", padx=5, pady=2)
+                    elif packed[0] is not row:
+                        row.pack(fill="x", padx=5, pady=2, before=packed[0])
+            prev = device_id
+        self._device_order = new_order
+
+        if rows:
+            self._list_status.pack_forget()
+        else:
+            self._list_status.configure(text="No devices yet.")
+            self._list_status.pack(pady=10)
+
+    def create_device_row(self):
+        """Build the widgets for one device row (filled in by bind_device_row)."""
+        row = ctk.CTkFrame(self.device_list_frame, fg_color="#2b2b2b")
+        row.data = None
+        row.label = ctk.CTkLabel(row, text="", anchor="w", font=("Arial", 13))
+        row.label.pack(side="left", padx=10, pady=5, fill="x", expand=True)
+        # Edit button
+        row.edit_btn = ctk.CTkButton(row, text="Edit", width=60, height=28,
+                                     fg_color="#2196F3", hover_color="#1976D2")
+        # Delete button (X)
+        row.delete_btn = ctk.CTkButton(row, text="✕", width=40, height=28,
+                                       fg_color="#f44336", hover_color="#d32f2f")
+        return row
+
+    def bind_device_row(self, row, device_id, name, watt, owner_id, can_modify):
+        info_text = f"{name} — {watt} W"
+        if owner_id is None:
+            info_text += " (Shared)"
+        row.label.configure(text=info_text)
+        if can_modify:
+            row.edit_btn.configure(command=lambda: self.edit_device(device_id, name, watt, owner_id))
+            row.delete_btn.configure(command=lambda: self.delete_device(device_id, name))
+            if row.data is None or not row.data[3]:
+                row.edit_btn.pack(side="right", padx=3, pady=5)
+                row.delete_btn.pack(side="right", padx=3, pady=5)
+        else:
+            row.edit_btn.pack_forget()
+            row.delete_btn.pack_forget()
+        row.data = (name, watt, owner_id, can_modify)
+
+    def edit_device(self, device_id, current_name, current_watt, owner_id=None):
         """Edit an existing device"""
         # Create edit dialog
         dialog = ctk.CTkToplevel(self)
@@ -197,17 +258,32 @@ class DevicesPage(ctk.CTkFrame):
 
             try:
                 watt_float = float(new_watt)
+            except ValueError:
+                messagebox.showerror("Error", "Wattage must be a valid number.", parent=dialog)
+                return
+
+            def update():
                 cursor.execute("UPDATE devices SET name = ?, watt_per_hour = ? WHERE id = ?",
                               (new_name, watt_float, device_id))
                 conn.commit()
+
+            def updated(_):
+                device = (device_id, new_name, watt_float, owner_id)
+                events.publish(events.DevicesChanged(self.controller.current_user_id, device_id, device))
                 self.refresh_devices()
                 dialog.destroy()
                 messagebox.showinfo("Success", "Device updated successfully!")
-            except ValueError:
-                messagebox.showerror("Error", "Wattage must be a valid number.", parent=dialog)
-            except Exception as e:
+
+            def failed(e):
+                save_btn.configure(state="normal")
+                if getattr(e, "errno", None) == DUPLICATE_NAME:
+                    messagebox.showerror("Error", "A device with that name already exists.", parent=dialog)
+                    return
                 messagebox.showerror("Error", f"Failed to update device: {str(e)}", parent=dialog)
 
+            save_btn.configure(state="disabled")
+            self.tasks.run(update, on_done=updated, on_error=failed, cancel_on_hide=False)
+
         save_btn = ctk.CTkButton(btn_frame, text="Save", width=120, command=save_changes,
                                  fg_color="#4CAF50", hover_color="#45a049")
         save_btn.pack(side="left", padx=5)
@@ -223,13 +299,24 @@ class DevicesPage(ctk.CTkFrame):
         )
         
         if result:
-            try:
-                cursor.execute("DELETE FROM devices WHERE id = ?", (device_id,))
-                conn.commit()
+            def delete():
+                try:
+                    # Its items lose the link (FK sets NULL); move its rollup rows with them
+                    rollups.forget_device(cursor, device_id)
+                    cursor.execute("DELETE FROM devices WHERE id = ?", (device_id,))
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+
+            def deleted(_):
+                # Rollup rows were re-keyed too, so usage views reload as well
+                events.publish(events.DevicesChanged(self.controller.current_user_id, device_id))
                 self.refresh_devices()
                 messagebox.showinfo("Success", f"Device '{device_name}' deleted successfully!")
-            except Exception as e:
-                messagebox.showerror("Error", f"Failed to delete device: {str(e)}")
+
+            self.tasks.run(delete, on_done=deleted, cancel_on_hide=False,
+                           on_error=lambda e: messagebox.showerror("Error", f"Failed to delete device: {str(e)}"))
 
     def on_show(self):
         # Refresh when the page becomes visible
@@ -240,7 +327,8 @@ class DevicesPage(ctk.CTkFrame):
                 self.user_label.configure(text=uname)
             else:
                 self.user_label.configure(text="Not logged in")
-            self.refresh_devices()
+            if self.dirty.needs_refresh(self.controller.current_user_id):
+                self.refresh_devices()
         except Exception:
             pass
 
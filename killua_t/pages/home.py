@@ -2,12 +2,21 @@ import customtkinter as ctk
 from database import db as _db
 from database.db import get_current_rate
 from .assets import get_logo
+from .tasks import UiTasks
+from core import events
+from .virtual_list import VirtualList
+
+# Pixel height of one recent-entry row (text plus the separator line)
+ENTRY_ROW_HEIGHT = 32
+RECENT_ENTRIES = 5
 
 
 class HomePage(ctk.CTkFrame):
     def __init__(self, parent, controller):
         super().__init__(parent)
         self.controller = controller
+        self.tasks = UiTasks(self)
+        self.dirty = events.DirtyFlag(events.RecordsChanged, events.RateChanged)
         self.grid_rowconfigure(1, weight=1)
         self.grid_columnconfigure(0, weight=1)
 
@@ -59,7 +68,7 @@ class HomePage(ctk.CTkFrame):
                         width=180, command=lambda: controller.show_frame("ProfilePage"))
         btn_profile.pack(pady=12)
 
-        btn_logout = ctk.CTkButton(left_col, text="Logout", width=180, command=lambda: [setattr(controller, 'current_user_id', None), setattr(controller, 'current_username', None), controller.show_frame('LoginPage')])
+        btn_logout = ctk.CTkButton(left_col, text="Logout", width=180, command=controller.logout)
         btn_logout.pack(pady=12)
 
         # Right column: summary / recent entries
@@ -96,11 +105,13 @@ class HomePage(ctk.CTkFrame):
         ctk.CTkLabel(header_frame, text="kWh", font=("Arial", 13, "bold"), anchor="w").grid(row=0, column=2, sticky="w", padx=(0, 12))
         ctk.CTkLabel(header_frame, text="Cost (₱)", font=("Arial", 13, "bold"), anchor="w").grid(row=0, column=3, sticky="w")
 
-        # Container for rows (grid layout)
-        self.recent_entries_frame = ctk.CTkFrame(table_frame, fg_color="transparent")
-        self.recent_entries_frame.pack(fill="x", expand=False)
-        for i in range(4):
-            self.recent_entries_frame.grid_columnconfigure(i, weight=1)
+        # Rows come from a small pool that is re-bound on every refresh
+        self.recent_entries_list = VirtualList(
+            table_frame, row_height=ENTRY_ROW_HEIGHT,
+            height=ENTRY_ROW_HEIGHT * RECENT_ENTRIES + 8,
+            create_row=self.create_entry_row, bind_row=self.bind_entry_row,
+        )
+        self.recent_entries_list.pack(fill="x", expand=False)
 
     def on_show(self):
         # Update displayed username when page is shown
@@ -112,104 +123,88 @@ class HomePage(ctk.CTkFrame):
                 self.user_label.configure(text=uname)
             else:
                 self.user_label.configure(text="Not logged in")
-            current_rate = get_current_rate()
-            self.rate_label.configure(text=f"Current MERALCO Rate: {current_rate:.2f} PHP / kWh")
         except Exception:
             pass
         
-        # Load recent entries for current user
-        self.load_recent_entries()
+        # Load rate and recent entries for current user, unless they're unchanged
+        if self.dirty.needs_refresh(getattr(self.controller, 'current_user_id', None)):
+            self.load_recent_entries()
 
     def load_recent_entries(self):
         """Load and display the 5 most recent entries for the current user."""
-        # Clear existing rows
-        for widget in self.recent_entries_frame.winfo_children():
-            widget.destroy()
-
-        try:
-            uid = getattr(self.controller, 'current_user_id', None)
-            if not uid:
-                # No user logged in
-                no_data_label = ctk.CTkLabel(
-                    self.recent_entries_frame, 
-                    text="No user logged in", 
-                    font=("Arial", 13),
-                    text_color="gray"
-                )
-                no_data_label.pack(pady=10)
-                return
-
-            # Query the 5 most recent record items for this user
-            cursor = _db.cursor
-            cursor.execute("""
-                SELECT ri.device_name, 
-                       ri.duration_minutes, 
-                       ri.kwh_used, 
-                       ri.cost,
-                       r.date
-                FROM record_items ri
-                JOIN records r ON ri.record_id = r.id
-                WHERE r.user_id = ?
-                ORDER BY r.date DESC, ri.id DESC
-                LIMIT 5
-            """, (uid,))
-            
-            rows = cursor.fetchall()
-            
-            if not rows:
-                # No entries found
-                no_data_label = ctk.CTkLabel(
-                    self.recent_entries_frame, 
-                    text="No entries yet", 
-                    font=("Arial", 13),
-                    text_color="gray"
-                )
-                no_data_label.pack(pady=10)
-                return
-
-            # Display each row using grid with separators
-            for idx, (device_name, duration_minutes, kwh_used, cost, date) in enumerate(rows):
-                base_row = idx * 2
-                duration_hours = duration_minutes / 60 if duration_minutes else 0
-
-                ctk.CTkLabel(
-                    self.recent_entries_frame,
-                    text=device_name[:22],
-                    font=("Arial", 12),
-                    anchor="w"
-                ).grid(row=base_row, column=0, sticky="w", padx=(0, 12), pady=3)
-
-                ctk.CTkLabel(
-                    self.recent_entries_frame,
-                    text=f"{duration_hours:.2f}",
-                    font=("Arial", 12),
-                    anchor="w"
-                ).grid(row=base_row, column=1, sticky="w", padx=(0, 12), pady=3)
-
-                ctk.CTkLabel(
-                    self.recent_entries_frame,
-                    text=f"{kwh_used:.2f}" if kwh_used else "0.00",
-                    font=("Arial", 12),
-                    anchor="w"
-                ).grid(row=base_row, column=2, sticky="w", padx=(0, 12), pady=3)
-
-                ctk.CTkLabel(
-                    self.recent_entries_frame,
-                    text=f"₱{cost:.2f}" if cost else "₱0.00",
-                    font=("Arial", 12),
-                    anchor="w"
-                ).grid(row=base_row, column=3, sticky="w", pady=3)
-
-                # Separator line beneath each row
-                sep = ctk.CTkFrame(self.recent_entries_frame, height=1, fg_color="#3a3a3a")
-                sep.grid(row=base_row + 1, column=0, columnspan=4, sticky="we", pady=(0, 2))
-
-        except Exception as e:
-            print(f"[HomePage] Error loading recent entries: {e}")
-            error_label = ctk.CTkLabel(
-                self.recent_entries_frame, 
-                text=f"Error loading entries", 
-                font=("Arial", 13),
-                text_color="red"
-            )
-            error_label.pack(pady=10)
+        uid = getattr(self.controller, 'current_user_id', None)
+        self._show_message("Loading..." if uid else "No user logged in")
+        generation = self.dirty.begin(uid)
+
+        def loaded(result):
+            self._show_recent_entries(result)
+            self.dirty.done(generation)
+
+        self.tasks.run(self._fetch_recent_entries, uid, on_done=loaded, on_error=self._show_load_error)
+
+    def _fetch_recent_entries(self, uid):
+        """Worker thread: return (current_rate, rows) — rows is None when logged out."""
+        current_rate = get_current_rate()
+        if not uid:
+            return current_rate, None
+
+        # Query the 5 most recent record items for this user
+        cursor = _db.cursor
+        cursor.execute("""
+            SELECT ri.device_name, 
+                   ri.duration_minutes, 
+                   ri.kwh_used, 
+                   ri.cost,
+                   r.date
+            FROM record_items ri
+            JOIN records r ON ri.record_id = r.id
+            WHERE r.user_id = ?
+            ORDER BY r.date DESC, ri.id DESC
+            LIMIT 5
+        """, (uid,))
+        return current_rate, cursor.fetchall()
+
+    def _show_message(self, text, color="gray"):
+        self.recent_entries_list.set_empty_text(text, color)
+        self.recent_entries_list.set_items([])
+
+    def _show_load_error(self, e):
+        print(f"[HomePage] Error loading recent entries: {e}")
+        self._show_message("Error loading entries", color="red")
+
+    def _show_recent_entries(self, result):
+        current_rate, rows = result
+        self.rate_label.configure(text=f"Current MERALCO Rate: {current_rate:.2f} PHP / kWh")
+        if rows is None:
+            self._show_message("No user logged in")
+            return
+        self.recent_entries_list.set_empty_text("No entries yet")
+        self.recent_entries_list.set_items(rows)
+
+    def create_entry_row(self, parent):
+        """Build one pooled recent-entry row: four columns and a separator line beneath."""
+        row = ctk.CTkFrame(parent, fg_color="transparent", height=ENTRY_ROW_HEIGHT)
+        for i in range(4):
+            row.grid_columnconfigure(i, weight=1)
+        row.cells = []
+        for col in range(4):
+            lbl = ctk.CTkLabel(row, text="", font=("Arial", 12), anchor="w", height=24)
+            lbl.grid(row=0, column=col, sticky="w", padx=(0, 12) if col < 3 else 0, pady=3)
+            row.cells.append(lbl)
+
+        # Separator line beneath each row
+        sep = ctk.CTkFrame(row, height=1, fg_color="#3a3a3a")
+        sep.grid(row=1, column=0, columnspan=4, sticky="we", pady=(0, 2))
+        return row
+
+    def bind_entry_row(self, row, entry, index):
+        device_name, duration_minutes, kwh_used, cost, date = entry
+        duration_hours = duration_minutes / 60 if duration_minutes else 0
+        texts = (
+            device_name[:22],
+            f"{duration_hours:.2f}",
+            f"{kwh_used:.2f}" if kwh_used else "0.00",
+            f"₱{cost:.2f}" if cost else "₱0.00",
+        )
+        for lbl, text in zip(row.cells, texts):
+            lbl.configure(text=text)
@@ -2,12 +2,16 @@ import customtkinter as ctk
 from customtkinter import CTkImage
 from PIL import Image
 import os
+from .tasks import UiTasks
+from core.session import Session
+from database.users import find_login
 
 
 class LoginPage(ctk.CTkFrame):
     def __init__(self, parent, controller):
         super().__init__(parent)
         self.controller = controller
+        self.tasks = UiTasks(self)
 
         # Full page background color similar to screenshot (dark)
         self.configure(fg_color="#191919")
@@ -61,8 +65,8 @@ class LoginPage(ctk.CTkFrame):
         self.entry_pass.pack(padx=22, fill="x")
 
         # Login button
-        login_btn = ctk.CTkButton(right, text="Login", fg_color="#222222", hover_color="#2e2e2e", width=300, corner_radius=8, command=self.login, font=("Arial", 13, "bold"))
-        login_btn.pack(padx=22, pady=12)
+        self.login_btn = ctk.CTkButton(right, text="Login", fg_color="#222222", hover_color="#2e2e2e", width=300, corner_radius=8, command=self.login, font=("Arial", 13, "bold"))
+        self.login_btn.pack(padx=22, pady=12)
 
         # Clickable signup hint
         signup = ctk.CTkLabel(right, text="Don't have an account? Sign up here.", font=("Arial", 12), text_color="#d0d0d0")
@@ -91,18 +95,19 @@ class LoginPage(ctk.CTkFrame):
         import hashlib
         pw_hash = hashlib.sha256(pw.encode('utf-8')).hexdigest()
 
-        try:
-            cursor = __import__('database.db', fromlist=['cursor']).cursor
-            cursor.execute("SELECT id FROM users WHERE username = ? AND password_hash = ?", (username, pw_hash))
-            row = cursor.fetchone()
-            if row:
-                user_id = row[0]
-                self.controller.current_user_id = user_id
-                self.controller.current_username = username
-                self.controller.show_frame("HomePage")
-            else:
-                from tkinter import messagebox
-                messagebox.showerror("Login Failed", "Invalid username or password.")
-        except Exception as e:
+        self.login_btn.configure(state="disabled", text="Logging in...")
+        self.tasks.run(find_login, username, pw_hash, cancel_on_hide=False,
+                       on_done=self._login_checked, on_error=self._login_failed)
+
+    def _login_checked(self, row):
+        self.login_btn.configure(state="normal", text="Login")
+        if row:
+            self.controller.login(Session.from_row(row))
+        else:
             from tkinter import messagebox
-            messagebox.showerror("Error", f"Login error: {e}")
+            messagebox.showerror("Login Failed", "Invalid username or password.")
+
+    def _login_failed(self, e):
+        self.login_btn.configure(state="normal", text="Login")
+        from tkinter import messagebox
+        messagebox.showerror("Error", f"Login error: {e}")
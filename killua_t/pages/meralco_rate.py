@@ -1,22 +1,30 @@
 import customtkinter as ctk
 from tkinter import messagebox
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from matplotlib.figure import Figure
 from datetime import datetime
 
 from .assets import get_logo
 from .sidebar import Sidebar
-from database.db import get_current_rate, add_meralco_rate, get_rate_history
+from .tasks import UiTasks
+from core import events
+from database.db import DEFAULT_MERALCO_RATE, get_current_rate, add_meralco_rate, get_rate_history
+from database.repricing import reprice_for_rate_change
+from database.tariffs import get_active_tariff, estimate_month
 
 
 class MeralcoRatePage(ctk.CTkFrame):
     def __init__(self, parent, controller):
         super().__init__(parent)
         self.controller = controller
+        self.tasks = UiTasks(self)
+        # Usage feeds the tariff estimate, so record changes count too
+        self.dirty = events.DirtyFlag(events.RateChanged, events.RecordsChanged)
         self.sidebar = None
-        self.current_rate = get_current_rate()
-        self.canvas = None
-        self.figure = None
+        self.current_rate = DEFAULT_MERALCO_RATE  # replaced by the stored rate in refresh_all
+        self._reprice_future = None
+        self.chart = None  # LineChart, built on first draw
+        self.annotate = None
+        self._hover_rates = []
+        self._hover_labels = []
 
         self.grid_rowconfigure(1, weight=1)
         self.grid_columnconfigure(0, weight=1)
@@ -67,12 +75,25 @@ class MeralcoRatePage(ctk.CTkFrame):
         self.new_rate_entry = ctk.CTkEntry(left_panel, width=200, placeholder_text="e.g. 12.75")
         self.new_rate_entry.pack(anchor="w", pady=(0, 8))
 
+        effective_label = ctk.CTkLabel(left_panel, text="Effective from (optional, YYYY-MM-DD):", font=("Arial", 12))
+        effective_label.pack(anchor="w", pady=(0, 6))
+
+        self.effective_entry = ctk.CTkEntry(left_panel, width=200, placeholder_text="today")
+        self.effective_entry.pack(anchor="w", pady=(0, 8))
+
         update_btn = ctk.CTkButton(left_panel, text="Update Rate", width=160, fg_color="#4CAF50", hover_color="#45a049", command=self.update_rate, font=("Arial", 13, "bold"))
         update_btn.pack(anchor="w", pady=(4, 12))
 
         self.status_label = ctk.CTkLabel(left_panel, text="", font=("Arial", 12), text_color="gray")
         self.status_label.pack(anchor="w")
 
+        # Tariff breakdown for the current month (when a tariff is configured)
+        tariff_title = ctk.CTkLabel(left_panel, text="This Month's Bill:", font=("Arial", 13, "bold"))
+        tariff_title.pack(anchor="w", pady=(18, 6))
+
+        self.tariff_label = ctk.CTkLabel(left_panel, text="", font=("Arial", 12), justify="left", anchor="w")
+        self.tariff_label.pack(anchor="w")
+
         # Right panel: graph
         right_panel = ctk.CTkFrame(body, fg_color="transparent")
         right_panel.pack(side="left", fill="both", expand=True, pady=10)
@@ -80,8 +101,6 @@ class MeralcoRatePage(ctk.CTkFrame):
         self.canvas_frame = ctk.CTkFrame(right_panel, fg_color="transparent")
         self.canvas_frame.pack(fill="both", expand=True)
 
-        self.refresh_all()
-
     def show_menu(self):
         if self.sidebar is None or not self.sidebar.winfo_exists():
             self.sidebar = Sidebar(self, self.controller, on_close=lambda: setattr(self, 'sidebar', None))
@@ -92,12 +111,35 @@ class MeralcoRatePage(ctk.CTkFrame):
             self.user_label.configure(text=uname if uname else "Not logged in")
         except Exception:
             pass
-        self.refresh_all()
+        if self.dirty.needs_refresh(getattr(self.controller, 'current_user_id', None)):
+            self.refresh_all()
 
     def refresh_all(self):
-        self.current_rate = get_current_rate()
-        self.rate_label.configure(text=f"Current Rate: {self.current_rate:.2f} PHP / kWh")
+        uid = getattr(self.controller, 'current_user_id', None)
+        generation = self.dirty.begin(uid)
+
+        def loaded(result):
+            self._show_all(result)
+            self.dirty.done(generation)
+
+        self.tasks.run(self._fetch_all, uid, on_done=loaded,
+                       on_error=lambda e: print(f"[MeralcoRatePage] Error loading rates: {e}"))
+
+    def _fetch_all(self, uid):
+        """Worker thread: current rate, recent history and the tariff estimate."""
+        current_rate = get_current_rate()
         history = get_rate_history(limit=50)
+        try:
+            tariff = get_active_tariff()
+            estimate = estimate_month(uid) if tariff is not None and uid else None
+        except Exception as e:
+            print(f"[MeralcoRatePage] Error computing tariff estimate: {e}")
+            tariff, estimate = False, None
+        return current_rate, history, tariff, estimate
+
+    def _show_all(self, result):
+        self.current_rate, history, tariff, estimate = result
+        self.rate_label.configure(text=f"Current Rate: {self.current_rate:.2f} PHP / kWh")
         if history:
             last_ts = history[-1][0]
             try:
@@ -109,7 +151,24 @@ class MeralcoRatePage(ctk.CTkFrame):
         else:
             self.last_updated_label.configure(text="No history yet")
         self.draw_graph(history)
-        self.status_label.configure(text="")
+        self.refresh_tariff(tariff, estimate)
+        if self._reprice_future is None or self._reprice_future.done():
+            self.status_label.configure(text="")
+
+    def refresh_tariff(self, tariff, estimate):
+        """Show the active tariff's itemized estimate for the current user's month."""
+        if tariff is False:
+            self.tariff_label.configure(text="")
+        elif tariff is None:
+            self.tariff_label.configure(text="No tariff configured; the flat rate above applies.")
+        elif estimate is None:
+            self.tariff_label.configure(text=f"Tariff: {tariff.name}")
+        else:
+            kwh, total, bill = estimate
+            lines = [f"Tariff: {tariff.name}", f"Usage so far: {kwh:.2f} kWh"]
+            lines += [f"  {name}: ₱{amount:.2f}" for name, amount in bill.lines]
+            lines.append(f"Estimated total: ₱{total:.2f}")
+            self.tariff_label.configure(text="\n".join(lines))
 
     def update_rate(self):
         raw = self.new_rate_entry.get().strip()
@@ -121,26 +180,76 @@ class MeralcoRatePage(ctk.CTkFrame):
         if new_rate <= 0:
             messagebox.showerror("Invalid", "Rate must be greater than 0.")
             return
-        try:
-            add_meralco_rate(new_rate)
+        raw_date = self.effective_entry.get().strip()
+        effective_at = None
+        if raw_date:
+            try:
+                effective_at = datetime.fromisoformat(raw_date)
+            except ValueError:
+                messagebox.showerror("Invalid", "Please enter the effective date as YYYY-MM-DD.")
+                return
+            if effective_at > datetime.now():
+                messagebox.showerror("Invalid", "Effective date cannot be in the future.")
+                return
+
+        def saved(_):
+            # The rate is shared by every user
+            events.publish(events.RateChanged())
             self.new_rate_entry.delete(0, "end")
-            self.status_label.configure(text="Rate updated.", text_color="#4CAF50")
+            self.effective_entry.delete(0, "end")
             self.refresh_all()
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to update rate: {e}")
+            self.status_label.configure(text="Rate updated.", text_color="#4CAF50")
+            if effective_at is not None:
+                self.start_repricing(effective_at)
 
-    def draw_graph(self, history):
-        # Clear previous widgets/canvas
-        for child in self.canvas_frame.winfo_children():
-            child.destroy()
-        self.canvas = None
-        self.figure = None
-
-        if not history:
-            empty = ctk.CTkLabel(self.canvas_frame, text="No rate history yet", text_color="gray", font=("Arial", 14))
-            empty.pack(expand=True)
+        self.tasks.run(add_meralco_rate, new_rate, effective_at=effective_at,
+                       on_done=saved, cancel_on_hide=False,
+                       on_error=lambda e: messagebox.showerror("Error", f"Failed to update rate: {e}"))
+
+    def start_repricing(self, effective_at):
+        """Re-price records covered by a backdated rate on a DB worker thread."""
+        if self._reprice_future is not None and not self._reprice_future.done():
+            self.status_label.configure(text="Re-pricing already running; run it again later.", text_color="orange")
             return
 
+        def progress(done, total):
+            # Called on the worker thread; hop back to Tk before touching widgets.
+            self.tasks.post(lambda: self.status_label.configure(
+                text=f"Re-pricing records... {done}/{total}", text_color="gray"))
+
+        def finished(result):
+            if result.records_changed:
+                events.publish(events.RecordsChanged())
+            self.status_label.configure(
+                text=f"Rate updated. Re-priced {result.records_changed} record(s).", text_color="#4CAF50")
+
+        self._reprice_future = self.tasks.run(
+            reprice_for_rate_change, effective_at, progress=progress,
+            on_done=finished, cancel_on_hide=False,
+            on_error=lambda e: self.status_label.configure(text=f"Re-pricing failed: {e}", text_color="red"))
+        self.status_label.configure(text="Re-pricing records...", text_color="gray")
+
+    def draw_graph(self, history):
+        if self.chart is None:
+            # matplotlib is imported here, not at startup, to keep launch fast
+            from .charts import LineChart
+            self.chart = LineChart(self.canvas_frame, color="#ffa000", xlabel="Update",
+                                   ylabel="Rate (PHP / kWh)", figsize=(5.5, 3.5), fill_alpha=0.25,
+                                   empty_text="No rate history yet")
+            # Hover tooltip: one annotation, moved and shown/hidden as needed
+            self.annotate = self.chart.ax.annotate(
+                "",
+                xy=(0, 0),
+                xytext=(10, 10),
+                textcoords="offset points",
+                bbox=dict(boxstyle="round,pad=0.5", facecolor="#333333", edgecolor="#ffa000", alpha=0.9),
+                arrowprops=dict(arrowstyle="->", color="#ffa000", lw=1.5),
+                fontsize=10,
+                color="white",
+                visible=False,
+            )
+            self.chart.canvas.mpl_connect("motion_notify_event", self.on_hover)
+
         dates = [h[0] for h in history]
         rates = [float(h[1]) for h in history]
 
@@ -152,77 +261,38 @@ class MeralcoRatePage(ctk.CTkFrame):
             except Exception:
                 labels.append(str(d))
 
-        self.figure = Figure(figsize=(5.5, 3.5), dpi=100, facecolor="#212121", edgecolor="white")
-        ax = self.figure.add_subplot(111)
-        ax.set_facecolor("#1a1a1a")
-
-        ax.plot(range(len(rates)), rates, marker='o', linewidth=2, markersize=6, color="#ffa000")
-        ax.fill_between(range(len(rates)), rates, alpha=0.25, color="#ffa000")
-
-        ax.set_xlabel("Update", fontsize=12, color="white")
-        ax.set_ylabel("Rate (PHP / kWh)", fontsize=12, color="white")
-        ax.set_xticks(range(len(labels)))
-        ax.set_xticklabels(labels, rotation=45, ha='right', fontsize=10, color="white")
-        ax.tick_params(axis='y', labelcolor='white')
-        ax.grid(True, alpha=0.2, color="white")
-
-        for spine in ax.spines.values():
-            spine.set_color("white")
+        self._hover_rates = rates
+        self._hover_labels = labels
+        self.chart.set_data(range(len(rates)), rates, labels=labels)
 
-        self.figure.tight_layout()
-        self.canvas = FigureCanvasTkAgg(self.figure, master=self.canvas_frame)
-        self.canvas.draw()
-        self.canvas.get_tk_widget().pack(fill="both", expand=True)
+    def _hide_tooltip(self):
+        if self.annotate.get_visible():
+            self.annotate.set_visible(False)
+            self.chart.canvas.draw_idle()
 
-        # Add hover tooltip support
-        self.annotate = None
-        self.canvas.mpl_connect("motion_notify_event", lambda event: self.on_hover(event, ax, rates, labels))
-
-    def on_hover(self, event, ax, rates, labels):
+    def on_hover(self, event):
         """Show tooltip on hover over graph points."""
-        if event.inaxes != ax:
-            if self.annotate:
-                self.annotate.remove()
-                self.annotate = None
-            self.canvas.draw_idle()
+        rates = self._hover_rates
+        if event.inaxes != self.chart.ax or not rates:
+            self._hide_tooltip()
             return
 
         # Find closest point to cursor
-        if not event.xdata or not event.ydata:
+        if event.xdata is None or event.ydata is None:
             return
 
-        x_pos = event.xdata
-        y_pos = event.ydata
-
         # Snap to nearest data point if close enough
-        distances = [abs(i - x_pos) for i in range(len(rates))]
-        min_dist_idx = min(range(len(distances)), key=lambda i: distances[i])
-        min_dist = distances[min_dist_idx]
+        min_dist_idx = min(max(int(round(event.xdata)), 0), len(rates) - 1)
+        min_dist = abs(min_dist_idx - event.xdata)
 
         # Show tooltip if within ~0.5 units horizontally
         if min_dist < 0.5:
             rate_val = rates[min_dist_idx]
-            date_label = labels[min_dist_idx]
-
-            # Remove old annotation
-            if self.annotate:
-                self.annotate.remove()
-
-            # Add new annotation at the data point
-            self.annotate = ax.annotate(
-                f"₱{rate_val:.2f}\n{date_label}",
-                xy=(min_dist_idx, rate_val),
-                xytext=(10, 10),
-                textcoords="offset points",
-                bbox=dict(boxstyle="round,pad=0.5", facecolor="#333333", edgecolor="#ffa000", alpha=0.9),
-                arrowprops=dict(arrowstyle="->", color="#ffa000", lw=1.5),
-                fontsize=10,
-                color="white",
-            )
-            self.canvas.draw_idle()
+            date_label = self._hover_labels[min_dist_idx]
+            self.annotate.xy = (min_dist_idx, rate_val)
+            self.annotate.set_text(f"₱{rate_val:.2f}\n{date_label}")
+            self.annotate.set_visible(True)
+            self.chart.canvas.draw_idle()
         else:
             # Remove annotation if too far
-            if self.annotate:
-                self.annotate.remove()
-                self.annotate = None
-                self.canvas.draw_idle()
+            self._hide_tooltip()
@@ -4,8 +4,12 @@ from PIL import Image
 import os
 from tkinter import filedialog, messagebox
 from database.db import conn, cursor
-from .assets import load_image, get_logo
+from database.tariffs import estimate_month
+from database import rollups
+from core import events
+from .assets import get_logo
 from .sidebar import Sidebar
+from .tasks import UiTasks
 from datetime import datetime
 
 
@@ -13,6 +17,9 @@ class ProfilePage(ctk.CTkFrame):
     def __init__(self, parent, controller):
         super().__init__(parent)
         self.controller = controller
+        self.tasks = UiTasks(self)
+        # Username/bio live in the session; this tracks the usage figures
+        self.dirty = events.DirtyFlag(events.RecordsChanged, events.DevicesChanged, events.RateChanged)
         self.sidebar = None
         self.configure(fg_color="#191919")
         self.grid_rowconfigure(1, weight=1)
@@ -138,53 +145,49 @@ class ProfilePage(ctk.CTkFrame):
             # Clear device bars
             for widget in self.devices_container.winfo_children():
                 widget.destroy()
+            self.dirty.mark()
             return
 
-        # Load username and bio
-        cursor.execute("SELECT username, bio FROM users WHERE id = ?", (uid,))
-        row = cursor.fetchone()
-        username = ""
-        bio = ""
-        if row:
-            username = row[0] or ""
-            bio = row[1] or ""
+        self.monthly_cost_label.configure(text="Loading...")
+        generation = self.dirty.begin(uid)
+
+        def loaded(result):
+            self._show_profile(result)
+            self.dirty.done(generation)
+
+        self.tasks.run(self._fetch_profile, uid, on_done=loaded,
+                       on_error=lambda e: print(f"[ProfilePage] Error loading profile: {e}"))
+
+    def _fetch_profile(self, uid):
+        """Worker thread: gather the usage figures the page shows for `uid`."""
+        # Calculate monthly cost for current month (tariff bill if one is configured)
+        _, monthly_cost, bill = estimate_month(uid)
+
+        # Compute total kwh
+        total = rollups.lifetime_kwh(uid)
+
+        # Get top 5 most used devices
+        top_devices = rollups.top_devices(uid, limit=5)
+        return monthly_cost, bill, total, top_devices
+
+    def _show_profile(self, result):
+        monthly_cost, bill, total, top_devices = result
+        # Username and bio come from the session, not the database
+        session = self.controller.session
+        username = session.username if session else ""
+        bio = session.bio if session else ""
 
         self.username_label.configure(text=username)
         self.bio_display.configure(text=bio if bio else "No description set.")
         self.bio_entry.delete("1.0", "end")
         self.bio_entry.insert("end", bio)
 
-        # Calculate monthly cost for current month
-        current_month = datetime.now().strftime("%Y-%m")
-        cursor.execute("""
-            SELECT SUM(total_cost) FROM records 
-            WHERE user_id = ? AND date LIKE ?
-        """, (uid, f"{current_month}%"))
-        monthly_cost = cursor.fetchone()[0] or 0.0
         month_name = datetime.now().strftime("%B %Y")
-        self.monthly_cost_label.configure(text=f"Total Cost ({month_name}): ₱{monthly_cost:.2f}")
+        label = "Estimated Bill" if bill is not None else "Total Cost"
+        self.monthly_cost_label.configure(text=f"{label} ({month_name}): ₱{monthly_cost:.2f}")
 
-        # Compute total kwh
-        cursor.execute("SELECT SUM(total_kwh) FROM records WHERE user_id = ?", (uid,))
-        total = cursor.fetchone()[0] or 0.0
         self.total_kwh_label.configure(text=f"- Total kWh: {total:.4f}")
 
-        # Get top 5 most used devices
-        cursor.execute("""
-        SELECT 
-            ri.device_name, 
-            SUM(ri.duration_minutes) as total_minutes, 
-            SUM(ri.kwh_used) as total_kwh,
-            SUM(ri.cost) as total_cost
-        FROM record_items ri
-        JOIN records r ON ri.record_id = r.id
-        WHERE r.user_id = ?
-        GROUP BY ri.device_name
-        ORDER BY total_minutes DESC
-        LIMIT 5
-        """, (uid,))
-        top_devices = cursor.fetchall()
-
         # Clear previous bars
         for widget in self.devices_container.winfo_children():
             widget.destroy()
@@ -242,20 +245,26 @@ class ProfilePage(ctk.CTkFrame):
         os.makedirs(profiles_dir, exist_ok=True)
         ext = os.path.splitext(path)[1].lower()
         dest = os.path.join(profiles_dir, f"{uid}{ext}")
-        try:
-            # Get the old profile_pic path from DB to delete the old file later
-            cursor.execute("SELECT profile_pic FROM users WHERE id = ?", (uid,))
-            row = cursor.fetchone()
-            old_profile_pic = row[0] if row else None
-            
-            # Write new file
-            with open(path, 'rb') as rf, open(dest, 'wb') as wf:
-                wf.write(rf.read())
-            # update DB with relative path
-            rel = os.path.relpath(dest, os.path.join(os.path.dirname(__file__), "..", "assets"))
-            cursor.execute("UPDATE users SET profile_pic = ? WHERE id = ?", (rel, uid))
-            conn.commit()
-            
+        # Old picture path, to delete the old file later
+        session = self.controller.session
+        old_profile_pic = session.profile_pic
+        rel = os.path.relpath(dest, assets_dir)
+
+        def upload():
+            try:
+                # Write new file
+                with open(path, 'rb') as rf, open(dest, 'wb') as wf:
+                    wf.write(rf.read())
+                # update DB with relative path
+                cursor.execute("UPDATE users SET profile_pic = ? WHERE id = ?", (rel, uid))
+                conn.commit()
+            except Exception:
+                try:
+                    conn.rollback()
+                except Exception:
+                    pass
+                raise
+
             # Delete old profile picture file if it exists and is different
             if old_profile_pic and old_profile_pic != rel:
                 try:
@@ -264,47 +273,52 @@ class ProfilePage(ctk.CTkFrame):
                         os.remove(old_full)
                 except Exception:
                     pass
-            
+
+        def uploaded(_):
             # Clear the image cache so the new image loads fresh
             from .assets import clear_image_cache
             clear_image_cache(rel)
             if old_profile_pic:
                 clear_image_cache(old_profile_pic)
-            
+
+            # The app re-applies the avatar on every page when it sees this
+            session.set_profile_pic(rel)
+            events.publish(events.ProfileChanged(uid))
             messagebox.showinfo("Saved", "Profile picture uploaded.")
-            # refresh this page and propagate the new image to other frames
-            self.refresh()
-            try:
-                self.controller.show_frame("ProfilePage")
-            except Exception:
-                pass
-        except Exception as e:
-            try:
-                conn.rollback()
-            except Exception:
-                pass
-            messagebox.showerror("Error", f"Failed to upload: {e}")
+
+        self.tasks.run(upload, on_done=uploaded, cancel_on_hide=False,
+                       on_error=lambda e: messagebox.showerror("Error", f"Failed to upload: {e}"))
 
     def save_profile(self):
         uid = getattr(self.controller, 'current_user_id', None)
         if not uid:
             return messagebox.showerror("Error", "Login first.")
         bio = self.bio_entry.get("1.0", "end").strip()
-        try:
-            cursor.execute("UPDATE users SET bio = ? WHERE id = ?", (bio, uid))
-            conn.commit()
+
+        def save():
+            try:
+                cursor.execute("UPDATE users SET bio = ? WHERE id = ?", (bio, uid))
+                conn.commit()
+            except Exception:
+                try:
+                    conn.rollback()
+                except Exception:
+                    pass
+                raise
+
+        def saved(_):
+            if self.controller.session is not None:
+                self.controller.session.bio = bio
+            events.publish(events.ProfileChanged(uid))
             messagebox.showinfo("Saved", "Profile updated.")
             # Hide the editor and update the display
             self.bio_entry.pack_forget()
             self.save_btn.pack_forget()
             self.bio_visible = False
             self.bio_display.configure(text=bio if bio else "No description set.")
-        except Exception as e:
-            try:
-                conn.rollback()
-            except Exception:
-                pass
-            messagebox.showerror("Error", f"Failed to save profile: {e}")
+
+        self.tasks.run(save, on_done=saved, cancel_on_hide=False,
+                       on_error=lambda e: messagebox.showerror("Error", f"Failed to save profile: {e}"))
 
     def on_show(self):
         """Update username label when the page becomes visible."""
@@ -314,7 +328,9 @@ class ProfilePage(ctk.CTkFrame):
                 self.user_label.configure(text=f"User: {uname}")
             else:
                 self.user_label.configure(text="Not logged in")
-            self.refresh()
+            uid = getattr(self.controller, 'current_user_id', None)
+            if not uid or self.dirty.needs_refresh(uid):
+                self.refresh()
         except Exception as e:
             print(f"[ProfilePage] Error in on_show: {e}")
 
@@ -1,17 +1,29 @@
 import customtkinter as ctk
+from tkinter import messagebox
 from database.db import cursor, conn
+from database.periods import day_range, format_record_date, month_range, quarter_range
+from database.records import fetch_records
+from database import rollups
 from .assets import get_logo
 from .sidebar import Sidebar
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from matplotlib.figure import Figure
-from datetime import datetime
+from .tasks import UiTasks
+from .virtual_list import VirtualList
+from core import events
+from core.downsample import lttb
+from datetime import date, datetime
+
+# Pixel height of one row in the records list (card plus its margins)
+RECORD_ROW_HEIGHT = 86
+# Most points drawn on the usage chart; longer series are downsampled (LTTB)
+CHART_POINT_BUDGET = 200
 
 
 class RecordsPage(ctk.CTkFrame):
     def __init__(self, parent, controller):
         super().__init__(parent)
         self.controller = controller
+        self.tasks = UiTasks(self)
+        self.dirty = events.DirtyFlag(events.RecordsChanged)
         self.sidebar = None
         self.grid_rowconfigure(1, weight=1)
         self.grid_columnconfigure(0, weight=1)
@@ -53,10 +65,32 @@ class RecordsPage(ctk.CTkFrame):
         left_title = ctk.CTkLabel(left_col, text="Records", font=("Arial", 16, "bold"), text_color="#c62828")
         left_title.pack(pady=(0, 10))
 
-        # Scrollable frame for records
-        records_scroll = ctk.CTkScrollableFrame(left_col, fg_color="transparent")
-        records_scroll.pack(fill="both", expand=True)
-        self.records_container = records_scroll
+        # Date-range filter: whole history, this month, this quarter or a custom range
+        filter_frame = ctk.CTkFrame(left_col, fg_color="transparent")
+        filter_frame.pack(fill="x", pady=(0, 6))
+        self.period_var = ctk.StringVar(value="All")
+        period_menu = ctk.CTkOptionMenu(filter_frame, variable=self.period_var, width=130,
+                                        values=["All", "This Month", "This Quarter", "Custom"],
+                                        command=lambda _: self.on_period_change())
+        period_menu.pack(side="left")
+        ctk.CTkButton(filter_frame, text="Apply", width=60, command=self.refresh_records).pack(side="right")
+
+        self.custom_frame = ctk.CTkFrame(left_col, fg_color="transparent")
+        self.entry_from = ctk.CTkEntry(self.custom_frame, placeholder_text="From (YYYY-MM-DD)", width=125)
+        self.entry_from.pack(side="left", padx=(0, 4))
+        self.entry_to = ctk.CTkEntry(self.custom_frame, placeholder_text="To (YYYY-MM-DD)", width=125)
+        self.entry_to.pack(side="left")
+
+        # Virtualized list of records; more pages load as it nears the bottom
+        self.records_list = VirtualList(left_col, row_height=RECORD_ROW_HEIGHT,
+                                        create_row=self.create_record_row, bind_row=self.bind_record_row,
+                                        on_near_end=self.load_more, empty_text="Loading records...")
+        self.records_list.pack(fill="both", expand=True)
+        self._rows = []            # records loaded so far, newest first
+        self._next_after = None    # keyset of the next page, None when exhausted
+        self._loading_more = False
+        self._query = 0            # bumped per refresh, so stale pages are ignored
+        self._period = (None, None)
 
         # Right column: Graph and refresh button
         right_col = ctk.CTkFrame(body, fg_color="transparent")
@@ -65,8 +99,8 @@ class RecordsPage(ctk.CTkFrame):
         # Canvas for matplotlib figure
         self.canvas_frame = ctk.CTkFrame(right_col, fg_color="transparent")
         self.canvas_frame.pack(fill="both", expand=True, pady=(0, 10))
-        self.canvas = None
-        self.figure = None
+        self.chart = None  # LineChart, built on first use
+        self._chart_stale = True  # no chart drawn for the current query yet
 
         # Refresh button below graph
         refresh_btn = ctk.CTkButton(
@@ -87,7 +121,11 @@ class RecordsPage(ctk.CTkFrame):
                 self.user_label.configure(text=uname)
             else:
                 self.user_label.configure(text="Not logged in")
-            self.refresh_records()
+            if self.dirty.needs_refresh(self.controller.current_user_id):
+                self.refresh_records()
+            elif self._chart_stale:
+                # The chart load was cancelled when the page was left
+                self.refresh_chart()
         except Exception as e:
             print(f"[RecordsPage] Error in on_show: {e}")
 
@@ -96,154 +134,188 @@ class RecordsPage(ctk.CTkFrame):
         if self.sidebar is None or not self.sidebar.winfo_exists():
             self.sidebar = Sidebar(self, self.controller, on_close=lambda: setattr(self, 'sidebar', None))
 
-    def refresh_records(self):
-        """Load records from DB and update both list and graph."""
-        try:
-            user_id = self.controller.current_user_id
-            
-            # Clear records list
-            for widget in self.records_container.winfo_children():
-                widget.destroy()
-
-            # Query records for current user
-            if user_id:
-                cursor.execute("SELECT id, date, total_kwh, total_cost FROM records WHERE user_id = ? ORDER BY date DESC", (user_id,))
-            else:
-                cursor.execute("SELECT id, date, total_kwh, total_cost FROM records WHERE user_id IS NULL ORDER BY date DESC")
-            
-            rows = cursor.fetchall()
-
-            if not rows:
-                no_data = ctk.CTkLabel(self.records_container, text="No records found", text_color="gray", font=("Arial", 13))
-                no_data.pack(pady=20)
-            else:
-                # Display each record with delete button
-                for rec in rows:
-                    record_id, date, total_kwh, total_cost = rec
-                    self.create_record_item(record_id, date, total_kwh, total_cost)
+    def on_period_change(self):
+        if self.period_var.get() == "Custom":
+            self.custom_frame.pack(fill="x", pady=(0, 6), before=self.records_list)
+        else:
+            self.custom_frame.pack_forget()
+            self.refresh_records()
 
-            # Update graph
-            self.update_graph(rows)
+    def selected_period(self):
+        """Return (since, until) for the chosen filter; raises ValueError on a bad custom date."""
+        choice = self.period_var.get()
+        if choice == "This Month":
+            return month_range()
+        if choice == "This Quarter":
+            return quarter_range()
+        if choice == "Custom":
+            raw_from = self.entry_from.get().strip()
+            raw_to = self.entry_to.get().strip()
+            first = datetime.fromisoformat(raw_from) if raw_from else None
+            last = datetime.fromisoformat(raw_to) if raw_to else None
+            return day_range(first, last)
+        return None, None
 
+    def refresh_records(self):
+        """Load the first page of records from DB and update both list and graph."""
+        try:
+            self._period = self.selected_period()
+        except ValueError:
+            return messagebox.showerror("Invalid", "Please enter dates as YYYY-MM-DD.")
+        # A new query supersedes any page still in flight
+        self.tasks.cancel_all()
+        self._rows = []
+        self._next_after = None
+        self._loading_more = False
+        self._query += 1
+        user_id = self.controller.current_user_id
+        self.records_list.set_items([], empty_text="Loading records...")
+        generation = self.dirty.begin(user_id)
+
+        def loaded(page):
+            self._show_records(page)
+            self.dirty.done(generation)
+
+        self.tasks.run(fetch_records, user_id, *self._period, on_done=loaded,
+                       on_error=lambda e: print(f"[RecordsPage] Error refreshing records: {e}"))
+        self.refresh_chart()
+
+    def load_more(self):
+        """Fetch the next page after the last loaded record, if any."""
+        if self._next_after is None or self._loading_more:
+            return
+        self._loading_more = True
+        user_id = self.controller.current_user_id
+        query = self._query
+        # Not cancelled on hide: a dropped page would leave _loading_more set
+        # and stop the list from ever loading further
+        self.tasks.run(fetch_records, user_id, *self._period, after=self._next_after,
+                       on_done=lambda page: self._append_records(page, query),
+                       on_error=lambda e: self._load_more_failed(e, query),
+                       cancel_on_hide=False)
+
+    def _load_more_failed(self, e, query):
+        if query == self._query:
+            self._loading_more = False
+        print(f"[RecordsPage] Error loading more records: {e}")
+
+    def _show_records(self, page):
+        rows, self._next_after = page
+        try:
+            self._rows = list(rows)
+            self.records_list.set_items(self._rows, empty_text="No records found")
         except Exception as e:
             print(f"[RecordsPage] Error refreshing records: {e}")
 
-    def create_record_item(self, record_id, date, total_kwh, total_cost):
-        """Create a record item with delete button."""
-        item_frame = ctk.CTkFrame(self.records_container, fg_color="#2b2b2b", corner_radius=6)
-        item_frame.pack(fill="x", pady=4, padx=4)
+    def _append_records(self, page, query):
+        if query != self._query:
+            return  # a page of a query that has since been replaced
+        rows, self._next_after = page
+        self._loading_more = False
+        self._rows.extend(rows)
+        self.records_list.append_items(rows)
+
+    def create_record_row(self, parent):
+        """Build one pooled record row (date, kWh, cost and a delete button)."""
+        row = ctk.CTkFrame(parent, fg_color="transparent", height=RECORD_ROW_HEIGHT)
+        item_frame = ctk.CTkFrame(row, fg_color="#2b2b2b", corner_radius=6)
+        item_frame.pack(fill="both", expand=True, pady=4, padx=4)
 
         # Record info
         info_frame = ctk.CTkFrame(item_frame, fg_color="transparent")
         info_frame.pack(side="left", fill="both", expand=True, padx=10, pady=8)
 
-        date_label = ctk.CTkLabel(info_frame, text=date, font=("Arial", 12, "bold"), text_color="white")
-        date_label.pack(anchor="w")
+        row.date_label = ctk.CTkLabel(info_frame, text="", font=("Arial", 12, "bold"), text_color="white", height=20)
+        row.date_label.pack(anchor="w")
 
-        kwh_label = ctk.CTkLabel(info_frame, text=f"{total_kwh:.2f} kWh", font=("Arial", 11), text_color="cyan")
-        kwh_label.pack(anchor="w")
+        row.kwh_label = ctk.CTkLabel(info_frame, text="", font=("Arial", 11), text_color="cyan", height=18)
+        row.kwh_label.pack(anchor="w")
 
-        cost_label = ctk.CTkLabel(info_frame, text=f"₱{total_cost:.2f}", font=("Arial", 11), text_color="#4CAF50")
-        cost_label.pack(anchor="w")
+        row.cost_label = ctk.CTkLabel(info_frame, text="", font=("Arial", 11), text_color="#4CAF50", height=18)
+        row.cost_label.pack(anchor="w")
 
         # Delete button
-        delete_btn = ctk.CTkButton(
+        row.delete_btn = ctk.CTkButton(
             item_frame,
             text="✕",
             width=30,
             height=30,
             fg_color="#d32f2f",
             hover_color="#c62828",
-            command=lambda: self.delete_record(record_id, item_frame)
         )
-        delete_btn.pack(side="right", padx=8, pady=8)
+        row.delete_btn.pack(side="right", padx=8, pady=8)
+        return row
+
+    def bind_record_row(self, row, rec, index):
+        record_id, date, total_kwh, total_cost = rec
+        row.date_label.configure(text=format_record_date(date))
+        row.kwh_label.configure(text=f"{total_kwh or 0:.2f} kWh")
+        row.cost_label.configure(text=f"₱{total_cost or 0:.2f}")
+        row.delete_btn.configure(command=lambda: self.delete_record(record_id))
 
-    def delete_record(self, record_id, item_widget):
+    def delete_record(self, record_id):
         """Delete a record from database and remove from list."""
+        self.tasks.run(self._delete_record, record_id,
+                       on_done=lambda _: self._record_deleted(record_id),
+                       on_error=lambda e: print(f"[RecordsPage] Error deleting record: {e}"),
+                       cancel_on_hide=False)
+
+    def _delete_record(self, record_id):
         try:
+            # Take the record out of the usage rollups in the same transaction
+            rollups.remove_record(cursor, record_id)
             # Delete record items first (foreign key)
             cursor.execute("DELETE FROM record_items WHERE record_id = ?", (record_id,))
             # Delete the record itself
             cursor.execute("DELETE FROM records WHERE id = ?", (record_id,))
             conn.commit()
-
-            # Remove from UI
-            item_widget.destroy()
-
-            # Refresh graph
-            self.refresh_graph_only()
-
-            print(f"[RecordsPage] Deleted record {record_id}")
-        except Exception as e:
-            print(f"[RecordsPage] Error deleting record: {e}")
-
-    def update_graph(self, rows):
-        """Draw line graph with dates and kWh values."""
+        except Exception:
+            conn.rollback()
+            raise
+
+    def _record_deleted(self, record_id):
+        events.publish(events.RecordsChanged(self.controller.current_user_id))
+        # Remove from UI
+        self._rows = [row for row in self._rows if row[0] != record_id]
+        self.records_list.set_items(self._rows, keep_position=True)
+
+        # Refresh graph
+        self.refresh_graph_only()
+
+        print(f"[RecordsPage] Deleted record {record_id}")
+
+    def refresh_chart(self):
+        """Reload the usage chart for the selected period from the rollup tables."""
+        user_id = self.controller.current_user_id
+        self._chart_stale = True
+        self.tasks.run(self._fetch_chart, user_id, *self._period, on_done=self.update_graph,
+                       on_error=self._chart_failed)
+
+    def _chart_failed(self, e):
+        self.dirty.mark()  # retry on the next visit
+        print(f"[RecordsPage] Error loading graph: {e}")
+
+    def _fetch_chart(self, user_id, since, until):
+        # Bucketed per day/week/month in SQL, then thinned to the point budget
+        bucket, series = rollups.usage_series(user_id, since, until)
+        days, kwh = lttb([d.toordinal() for d, _ in series], [v for _, v in series], CHART_POINT_BUDGET)
+        return bucket, [date.fromordinal(d) for d in days], kwh
+
+    def update_graph(self, series):
+        """Draw the usage line on a date axis; `series` is (bucket, dates, kwh)."""
+        bucket, dates, kwh_values = series
+        self._chart_stale = False
         try:
-            # Clear previous canvas if exists
-            if self.canvas:
-                self.canvas.get_tk_widget().destroy()
-                self.canvas = None
-
-            if not rows:
-                # No data - show empty message
-                empty_label = ctk.CTkLabel(
-                    self.canvas_frame,
-                    text="No data to display",
-                    text_color="gray",
-                    font=("Arial", 14)
-                )
-                empty_label.pack(expand=True)
-                return
-
-            # Extract dates and kwh values
-            dates = [row[1] for row in rows]  # date
-            kwh_values = [row[2] if row[2] else 0 for row in rows]  # total_kwh
-
-            # Reverse to show oldest first (left to right)
-            dates = list(reversed(dates))
-            kwh_values = list(reversed(kwh_values))
-
-            # Create matplotlib figure
-            self.figure = Figure(figsize=(6, 4), dpi=100, facecolor="#212121", edgecolor="white")
-            ax = self.figure.add_subplot(111)
-            ax.set_facecolor("#1a1a1a")
-
-            # Plot line
-            ax.plot(range(len(dates)), kwh_values, marker='o', linewidth=2, markersize=6, color="#1976d2")
-            ax.fill_between(range(len(dates)), kwh_values, alpha=0.3, color="#1976d2")
-
-            # Format axes
-            ax.set_xlabel("Date", fontsize=12, color="white")
-            ax.set_ylabel("kWh", fontsize=12, color="white")
-            ax.set_xticks(range(len(dates)))
-            ax.set_xticklabels(dates, rotation=45, ha='right', fontsize=10, color="white")
-            ax.tick_params(axis='y', labelcolor='white')
-            ax.grid(True, alpha=0.2, color="white")
-
-            # Spine colors
-            for spine in ax.spines.values():
-                spine.set_color("white")
-
-            self.figure.tight_layout()
-
-            # Embed in tkinter
-            self.canvas = FigureCanvasTkAgg(self.figure, master=self.canvas_frame)
-            self.canvas.draw()
-            self.canvas.get_tk_widget().pack(fill="both", expand=True)
+            if self.chart is None:
+                from .charts import LineChart  # first chart: loads matplotlib
+                self.chart = LineChart(self.canvas_frame, color="#1976d2", xlabel="Date", ylabel="kWh",
+                                       date_axis=True)
+            self.chart.ax.set_xlabel(f"Date (per {bucket})", fontsize=12, color="white")
+            self.chart.set_data(dates, kwh_values)
 
         except Exception as e:
             print(f"[RecordsPage] Error updating graph: {e}")
 
     def refresh_graph_only(self):
         """Refresh only the graph (used after deleting a record)."""
-        try:
-            user_id = self.controller.current_user_id
-            if user_id:
-                cursor.execute("SELECT id, date, total_kwh, total_cost FROM records WHERE user_id = ? ORDER BY date DESC", (user_id,))
-            else:
-                cursor.execute("SELECT id, date, total_kwh, total_cost FROM records WHERE user_id IS NULL ORDER BY date DESC")
-            rows = cursor.fetchall()
-            self.update_graph(rows)
-        except Exception as e:
-            print(f"[RecordsPage] Error refreshing graph: {e}")
+        self.refresh_chart()
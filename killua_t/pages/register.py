@@ -5,12 +5,15 @@ import os
 from tkinter import messagebox
 from database.db import conn, cursor
 import hashlib
+from .tasks import UiTasks
+from core.session import Session
 
 
 class RegistrationPage(ctk.CTkFrame):
     def __init__(self, parent, controller):
         super().__init__(parent)
         self.controller = controller
+        self.tasks = UiTasks(self)
         self.configure(fg_color="#191919")
 
         # make the content background match the app background
@@ -59,8 +62,8 @@ class RegistrationPage(ctk.CTkFrame):
         self.entry_pass2 = ctk.CTkEntry(right, placeholder_text="", show="*", width=300, fg_color="#ffffff", text_color="#000")
         self.entry_pass2.pack(padx=22, fill="x")
 
-        reg_btn = ctk.CTkButton(right, text="Create Account", width=300, corner_radius=8, command=self.register, font=("Arial", 13, "bold"))
-        reg_btn.pack(padx=22, pady=18)
+        self.reg_btn = ctk.CTkButton(right, text="Create Account", width=300, corner_radius=8, command=self.register, font=("Arial", 13, "bold"))
+        self.reg_btn.pack(padx=22, pady=18)
 
         back = ctk.CTkButton(right, text="Back to Login", width=200, command=lambda: controller.show_frame("LoginPage"), font=("Arial", 12, "bold"))
         back.pack(padx=22)
@@ -77,18 +80,28 @@ class RegistrationPage(ctk.CTkFrame):
 
         pw_hash = hashlib.sha256(pw.encode('utf-8')).hexdigest()
 
+        self.reg_btn.configure(state="disabled")
+        self.tasks.run(self._create_user, username, pw_hash, cancel_on_hide=False,
+                       on_done=lambda user_id: self._registered(user_id, username),
+                       on_error=self._register_failed)
+
+    def _create_user(self, username, pw_hash):
         try:
             cursor.execute("INSERT INTO users (username, password_hash) VALUES (?, ?)", (username, pw_hash))
             conn.commit()
-            user_id = cursor.lastrowid
-            # set current user in controller
-            self.controller.current_user_id = user_id
-            self.controller.current_username = username
-            messagebox.showinfo("Success", "Account created and logged in.")
-            self.controller.show_frame("HomePage")
-        except Exception as e:
+            return cursor.lastrowid
+        except Exception:
             try:
                 conn.rollback()
             except Exception:
                 pass
-            messagebox.showerror("DB Error", f"Failed to create account: {e}")
+            raise
+
+    def _registered(self, user_id, username):
+        self.reg_btn.configure(state="normal")
+        messagebox.showinfo("Success", "Account created and logged in.")
+        self.controller.login(Session(user_id, username))
+
+    def _register_failed(self, e):
+        self.reg_btn.configure(state="normal")
+        messagebox.showerror("DB Error", f"Failed to create account: {e}")
@@ -0,0 +1,80 @@
+import queue
+from database import worker
+
+# How often (ms) the Tk thread checks for finished background work while any is pending.
+POLL_MS = 20
+
+
+class UiTasks:
+    """Run DB work off the Tk main thread and hand results back to it.
+
+    `run()` submits a function to the DB worker pool and returns its Future;
+    `on_done(result)` / `on_error(exc)` are called later on the Tk thread via
+    `after()`. Reads started with `cancel_on_hide=True` are cancelled (or their
+    results dropped) by `cancel_all()`, which main.show_frame calls when the
+    user navigates away from the page.
+    """
+
+    def __init__(self, widget):
+        self.widget = widget
+        self._queue = queue.Queue()
+        self._pending = {}  # future -> cancel_on_hide
+        self._generation = 0
+        self._polling = False
+
+    def run(self, fn, *args, on_done=None, on_error=None, cancel_on_hide=True, **kwargs):
+        generation = self._generation if cancel_on_hide else None
+        future = worker.submit(fn, *args, **kwargs)
+        self._pending[future] = cancel_on_hide
+        future.add_done_callback(
+            lambda f: self._queue.put((self._deliver, (f, generation, on_done, on_error))))
+        self._ensure_polling()
+        return future
+
+    def post(self, fn, *args):
+        """Schedule `fn(*args)` on the Tk thread. Safe to call from worker threads."""
+        self._queue.put((fn, args))
+
+    @property
+    def busy(self):
+        return bool(self._pending)
+
+    def cancel_all(self):
+        """Cancel pending reads and drop results of ones already running."""
+        self._generation += 1
+        for future, cancellable in list(self._pending.items()):
+            if cancellable:
+                future.cancel()
+
+    def _deliver(self, future, generation, on_done, on_error):
+        self._pending.pop(future, None)
+        if future.cancelled() or (generation is not None and generation != self._generation):
+            return
+        exc = future.exception()
+        if exc is not None:
+            if on_error is not None:
+                on_error(exc)
+            else:
+                print(f"[UiTasks] Background task failed: {exc}")
+        elif on_done is not None:
+            on_done(future.result())
+
+    def _ensure_polling(self):
+        if not self._polling:
+            self._polling = True
+            self.widget.after(POLL_MS, self._pump)
+
+    def _pump(self):
+        while True:
+            try:
+                fn, args = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                fn(*args)
+            except Exception as e:
+                print(f"[UiTasks] Error in UI callback: {e}")
+        if self._pending or not self._queue.empty():
+            self.widget.after(POLL_MS, self._pump)
+        else:
+            self._polling = False
@@ -1,17 +1,28 @@
 import customtkinter as ctk
 from tkinter import messagebox
-from database.db import conn, cursor, get_current_rate
+from database.db import DEFAULT_MERALCO_RATE, conn, cursor, get_current_rate, insert_many
+from database.rates import get_rate_index, loaded_rate_index, rate_at
+from database import rollups
+from core import energy, events
 from datetime import datetime
 from .assets import get_logo
 from .sidebar import Sidebar
+from .tasks import UiTasks
+
+# How many matches the device picker lists while typing
+PICKER_MATCHES = 20
 
 
 class UsagePage(ctk.CTkFrame):
     def __init__(self, parent, controller):
         super().__init__(parent)
         self.controller = controller
+        self.tasks = UiTasks(self)
+        self.dirty = events.DirtyFlag(events.RateChanged)
+        # The controller's device catalog has already applied the change
+        events.subscribe(events.DevicesChanged, lambda e: self.filter_devices())
         self.sidebar = None
-        self.current_rate = get_current_rate()
+        self.current_rate = DEFAULT_MERALCO_RATE  # replaced by the stored rate in on_show
         self.daily_entries = []  # Store entries for the day before confirming
         self.grid_rowconfigure(1, weight=1)
         self.grid_columnconfigure(0, weight=1)
@@ -52,8 +63,10 @@ class UsagePage(ctk.CTkFrame):
         
         self.device_var = ctk.StringVar()
         self.combo = ctk.CTkComboBox(left, variable=self.device_var,
-                                     values=self.load_devices(), width=300)
+                                     values=[], width=300)
         self.combo.pack(pady=(0, 8))
+        # Type-ahead: the dropdown lists the best matches for what's typed
+        self.combo.bind("<KeyRelease>", self.filter_devices, add=True)
 
         # Hours input
         hours_label = ctk.CTkLabel(left, text="Hours:", font=("Arial", 13), anchor="w")
@@ -70,9 +83,9 @@ class UsagePage(ctk.CTkFrame):
         self.entry_minutes.pack(pady=(0, 8))
 
         # Add to list button
-        add_btn = ctk.CTkButton(left, text="Add Device to List", width=160,
-                                command=self.add_entry, fg_color="#4CAF50", hover_color="#45a049")
-        add_btn.pack(pady=8)
+        self.add_btn = ctk.CTkButton(left, text="Add Device to List", width=160,
+                                     command=self.add_entry, fg_color="#4CAF50", hover_color="#45a049")
+        self.add_btn.pack(pady=8)
 
         # Clear list button
         clear_btn = ctk.CTkButton(left, text="Clear List", width=160,
@@ -80,9 +93,9 @@ class UsagePage(ctk.CTkFrame):
         clear_btn.pack(pady=4)
 
         # Confirm/Save button
-        confirm_btn = ctk.CTkButton(left, text="Confirm & Save Day", width=160,
-                                    command=self.confirm_day, fg_color="#2196F3", hover_color="#1976D2")
-        confirm_btn.pack(pady=12)
+        self.confirm_btn = ctk.CTkButton(left, text="Confirm & Save Day", width=160,
+                                         command=self.confirm_day, fg_color="#2196F3", hover_color="#1976D2")
+        self.confirm_btn.pack(pady=12)
 
         # Results / today's list
         right = ctk.CTkFrame(body, fg_color="transparent")
@@ -94,9 +107,10 @@ class UsagePage(ctk.CTkFrame):
         self.result = ctk.CTkTextbox(right, width=500, height=320)
         self.result.pack(pady=8, fill="both", expand=True)
 
-    def load_devices(self):
-        cursor.execute("SELECT name FROM devices")
-        return [row[0] for row in cursor.fetchall()]
+    def filter_devices(self, event=None):
+        """Show the devices matching the picker text in its dropdown."""
+        matches = self.controller.devices.index.search(self.device_var.get(), PICKER_MATCHES)
+        self.combo.configure(values=[name for _, name in matches])
 
     def add_entry(self):
         """Add a device entry to the daily list"""
@@ -104,8 +118,12 @@ class UsagePage(ctk.CTkFrame):
         hours_str = self.entry_hours.get().strip()
         minutes_str = self.entry_minutes.get().strip()
 
+        device = self.controller.devices.lookup(device_name) if device_name else None
         if not device_name:
             return messagebox.showerror("Error", "Please select a device.")
+        if device is None:
+            return messagebox.showerror("Error", "Device not found.")
+        device_id, device_name, watt, _ = device
 
         # Parse hours and minutes (default to 0 if empty)
         try:
@@ -118,21 +136,20 @@ class UsagePage(ctk.CTkFrame):
         if hours_val == 0 and minutes_val == 0:
             return messagebox.showerror("Error", "Please enter hours and/or minutes.")
 
-        cursor.execute("SELECT watt_per_hour FROM devices WHERE name = ?", (device_name,))
-        result = cursor.fetchone()
-        if not result:
-            return messagebox.showerror("Error", "Device not found.")
-        watt = result[0]
+        # Wattage comes from the device catalog and the rate from the rate
+        # index loaded in on_show, so adding an entry needs no query. Until
+        # the index is there, preview with the current rate; _save_day prices
+        # the saved day on the worker either way.
+        index = loaded_rate_index()
+        rate = index.rate_at(datetime.now()) if index is not None else self.current_rate
 
         # Convert to total minutes and calculate kWh/cost
         total_minutes = (hours_val * 60) + minutes_val
-        hours = total_minutes / 60
-        kwh = (watt * hours) / 1000
-        rate = self.current_rate or get_current_rate()
-        cost = kwh * rate
+        kwh, cost = energy.item_usage(watt, total_minutes, rate)
 
         # Store entry
         entry = {
+            "device_id": device_id,
             "device_name": device_name,
             "watt": watt,
             "hours": hours_val,
@@ -146,6 +163,7 @@ class UsagePage(ctk.CTkFrame):
 
         # Clear input fields
         self.device_var.set("")
+        self.filter_devices()
         self.entry_hours.delete(0, "end")
         self.entry_minutes.delete(0, "end")
 
@@ -161,9 +179,6 @@ class UsagePage(ctk.CTkFrame):
             self.result.insert("end", "No entries yet. Add devices above.\n")
             return
 
-        total_kwh = 0
-        total_cost = 0
-
         for i, entry in enumerate(self.daily_entries, 1):
             self.result.insert("end", f"{i}. {entry['device_name']}\n")
             self.result.insert("end", f"   Wattage: {entry['watt']}W\n")
@@ -171,8 +186,11 @@ class UsagePage(ctk.CTkFrame):
             self.result.insert("end", f"   kWh: {entry['kwh']:.4f}\n")
             self.result.insert("end", f"   Cost: ₱{entry['cost']:.2f}\n")
             self.result.insert("end", "\n")
-            total_kwh += entry['kwh']
-            total_cost += entry['cost']
+
+        total_kwh, total_cost = energy.totals(
+            [entry['kwh'] for entry in self.daily_entries],
+            [entry['cost'] for entry in self.daily_entries],
+        )
 
         # Summary footer
         self.result.insert("end", "─" * 40 + "\n")
@@ -197,14 +215,32 @@ class UsagePage(ctk.CTkFrame):
         if not self.daily_entries:
             return messagebox.showerror("Error", "Please add at least one device before confirming.")
 
+        # Create a single record for the day
+        today = datetime.now().replace(microsecond=0)
+        user_id = self.controller.current_user_id
+        entries = [dict(entry) for entry in self.daily_entries]
+        self.confirm_btn.configure(state="disabled")
+        self.tasks.run(self._save_day, today, user_id, entries,
+                       on_done=self._day_saved, on_error=self._day_save_failed,
+                       cancel_on_hide=False)
+
+    def _save_day(self, today, user_id, entries):
+        """Worker thread: insert the record and its items; returns the day's total cost."""
         try:
-            # Create a single record for the day
-            today = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            user_id = self.controller.current_user_id
-            
-            # Calculate totals
-            total_kwh = sum(entry['kwh'] for entry in self.daily_entries)
-            total_cost = sum(entry['cost'] for entry in self.daily_entries)
+            # Price every entry with the rate in force when the day is saved,
+            # and get the totals from the same pass
+            rate = rate_at(today)
+            usage = energy.compute(
+                [entry['watt'] for entry in entries],
+                [entry['total_minutes'] for entry in entries],
+                rate,
+            )
+            for entry, kwh, cost in zip(entries, usage.kwh, usage.cost):
+                entry['kwh'] = kwh
+                entry['cost'] = cost
+                entry['rate'] = rate
+            total_kwh = usage.total_kwh
+            total_cost = usage.total_cost
 
             # Insert record
             cursor.execute(
@@ -213,26 +249,41 @@ class UsagePage(ctk.CTkFrame):
             )
             record_id = cursor.lastrowid
 
-            # Insert all entries as record_items
-            for entry in self.daily_entries:
-                cursor.execute(
-                    "INSERT INTO record_items (record_id, device_name, watt_per_hour, duration_minutes, kwh_used, cost) VALUES (?, ?, ?, ?, ?, ?)",
-                    (record_id, entry['device_name'], entry['watt'], entry['total_minutes'], entry['kwh'], entry['cost'])
-                )
+            # Insert all entries as record_items in one multi-row statement
+            insert_many(
+                cursor,
+                "record_items",
+                ("record_id", "device_id", "device_name", "watt_per_hour", "duration_minutes", "kwh_used", "cost"),
+                [(record_id, entry['device_id'], entry['device_name'], entry['watt'], entry['total_minutes'], entry['kwh'], entry['cost'])
+                 for entry in entries],
+            )
+            rollups.apply_items(
+                cursor, user_id, today,
+                [(entry['device_id'], entry['device_name'], entry['total_minutes'], entry['kwh'], entry['cost'])
+                 for entry in entries],
+            )
 
             conn.commit()
-            messagebox.showinfo("Saved", f"Day's usage saved! Total: ₱{total_cost:.2f}")
-            
-            # Clear the list
-            self.daily_entries = []
-            self.refresh_display()
-
-        except Exception as e:
+            return total_cost
+        except Exception:
             try:
                 conn.rollback()
             except Exception:
                 pass
-            messagebox.showerror("DB Error", f"Failed to save record: {e}")
+            raise
+
+    def _day_saved(self, total_cost):
+        self.confirm_btn.configure(state="normal")
+        events.publish(events.RecordsChanged(self.controller.current_user_id))
+        messagebox.showinfo("Saved", f"Day's usage saved! Total: ₱{total_cost:.2f}")
+
+        # Clear the list
+        self.daily_entries = []
+        self.refresh_display()
+
+    def _day_save_failed(self, e):
+        self.confirm_btn.configure(state="normal")
+        messagebox.showerror("DB Error", f"Failed to save record: {e}")
 
     def show_menu(self):
         """Show sidebar menu."""
@@ -240,16 +291,32 @@ class UsagePage(ctk.CTkFrame):
             self.sidebar = Sidebar(self, self.controller, on_close=lambda: setattr(self, 'sidebar', None))
 
     def on_show(self):
-        # Refresh the device list each time the page is shown (handles runtime DB changes)
+        # Reload the rate and device list if they changed since they were last shown
         try:
             uname = getattr(self.controller, 'current_username', None)
             if uname:
                 self.user_label.configure(text=uname)
             else:
                 self.user_label.configure(text="Not logged in")
-            self.current_rate = get_current_rate()
-            devices = self.load_devices()
-            self.combo.configure(values=devices)
             self.refresh_display()
         except Exception:
             pass
+        self.controller.load_devices(self.tasks, lambda catalog: self.filter_devices(),
+                                     on_error=lambda e: print(f"[UsagePage] Error loading devices: {e}"))
+        user_id = getattr(self.controller, 'current_user_id', None)
+        if not self.dirty.needs_refresh(user_id):
+            return
+        generation = self.dirty.begin(user_id)
+
+        def loaded(rate):
+            self.current_rate = rate
+            self.refresh_display()
+            self.dirty.done(generation)
+
+        self.tasks.run(self._load_rates, on_done=loaded,
+                       on_error=lambda e: print(f"[UsagePage] Error loading rates: {e}"))
+
+    def _load_rates(self):
+        """Worker thread: warm the rate index used by add_entry and return the current rate."""
+        get_rate_index()
+        return get_current_rate()
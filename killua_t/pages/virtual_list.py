@@ -0,0 +1,139 @@
+import customtkinter as ctk
+
+
+class VirtualList(ctk.CTkFrame):
+    """Scrollable list that only builds widgets for the rows in view.
+
+    A fixed pool of row widgets (enough to fill the viewport plus one) is
+    created with `create_row(parent)` and re-bound to data with
+    `bind_row(row, item, index)` as the list scrolls, so memory use and
+    refresh time don't grow with the number of items. Rows all have the same
+    height. `on_near_end()` is called when the view gets within a screenful
+    of the last item (use it to fetch the next page).
+    """
+
+    WHEEL_ROWS = 2  # rows scrolled per mouse-wheel notch
+
+    def __init__(self, parent, row_height, create_row, bind_row, on_near_end=None,
+                 empty_text="", **kwargs):
+        kwargs.setdefault("fg_color", "transparent")
+        super().__init__(parent, **kwargs)
+        self.pack_propagate(False)
+        self.row_height = row_height
+        self._create_row = create_row
+        self._bind_row = bind_row
+        self.on_near_end = on_near_end
+        self.items = []
+        self._top = 0   # scroll offset in (scaled) pixels
+        self._pool = []
+
+        self._scrollbar = ctk.CTkScrollbar(self, command=self._on_scrollbar)
+        self._scrollbar.pack(side="right", fill="y")
+        self._viewport = ctk.CTkFrame(self, fg_color="transparent")
+        self._viewport.pack(side="left", fill="both", expand=True)
+        self._empty = ctk.CTkLabel(self._viewport, text=empty_text, text_color="gray", font=("Arial", 13))
+        self._viewport.bind("<Configure>", lambda e: self._layout())
+        self._bind_wheel(self._viewport)
+
+    # -- data ------------------------------------------------------------
+    def set_items(self, items, empty_text=None, keep_position=False):
+        """Replace the data; scrolls back to the top unless `keep_position`."""
+        self.items = list(items)
+        if empty_text is not None:
+            self._empty.configure(text=empty_text)
+        if not keep_position:
+            self._top = 0
+        self._rebind_all()
+
+    def set_empty_text(self, text, color="gray"):
+        """Text shown while the list has no items (e.g. "Loading...", "No records found")."""
+        self._empty.configure(text=text, text_color=color)
+
+    def append_items(self, items):
+        self.items.extend(items)
+        self._layout()
+
+    def refresh(self):
+        """Re-bind the visible rows (after items were changed in place)."""
+        self._rebind_all()
+
+    def _rebind_all(self):
+        for row in self._pool:
+            row._vl_item = row._vl_index = None
+        self._layout()
+
+    # -- scrolling -------------------------------------------------------
+    def _row_px(self):
+        return max(1, round(self._apply_widget_scaling(self.row_height)))
+
+    def _max_top(self):
+        return max(0, len(self.items) * self._row_px() - self._viewport.winfo_height())
+
+    def scroll_to(self, top):
+        self._top = int(min(max(top, 0), self._max_top()))
+        self._layout()
+
+    def _on_scrollbar(self, action, amount, unit=None):
+        total = len(self.items) * self._row_px()
+        if action == "moveto":
+            self.scroll_to(float(amount) * total)
+        elif unit == "pages":
+            self.scroll_to(self._top + int(amount) * self._viewport.winfo_height())
+        else:
+            self.scroll_to(self._top + int(amount) * self._row_px())
+
+    def _on_wheel(self, event):
+        if getattr(event, "num", None) == 4 or getattr(event, "delta", 0) > 0:
+            step = -self.WHEEL_ROWS
+        else:
+            step = self.WHEEL_ROWS
+        self.scroll_to(self._top + step * self._row_px())
+        return "break"
+
+    def _bind_wheel(self, widget):
+        widget.bind("<MouseWheel>", self._on_wheel, add="+")
+        widget.bind("<Button-4>", self._on_wheel, add="+")
+        widget.bind("<Button-5>", self._on_wheel, add="+")
+        for child in widget.winfo_children():
+            self._bind_wheel(child)
+
+    # -- layout ----------------------------------------------------------
+    def _layout(self):
+        height = self._viewport.winfo_height()
+        row_px = self._row_px()
+        needed = height // row_px + 2
+        while len(self._pool) < needed:
+            row = self._create_row(self._viewport)
+            row.pack_propagate(False)
+            row.grid_propagate(False)
+            row._vl_item = row._vl_index = None
+            self._bind_wheel(row)
+            self._pool.append(row)
+
+        self._top = min(self._top, self._max_top())
+        first, offset = divmod(self._top, row_px)
+        count = len(self.items)
+        for i, row in enumerate(self._pool):
+            index = first + i
+            if i >= needed or index >= count:
+                row.place_forget()
+                continue
+            item = self.items[index]
+            if row._vl_index != index or row._vl_item is not item:
+                self._bind_row(row, item, index)
+                row._vl_item, row._vl_index = item, index
+            row.place(x=0, y=i * row_px - offset, relwidth=1.0)
+
+        if count:
+            self._empty.place_forget()
+        else:
+            self._empty.place(relx=0.5, y=20, anchor="n")
+
+        total = count * row_px
+        if total <= height or total == 0:
+            self._scrollbar.set(0.0, 1.0)
+        else:
+            self._scrollbar.set(self._top / total, (self._top + height) / total)
+
+        if self.on_near_end is not None and count and first + 2 * needed >= count:
+            self.on_near_end()
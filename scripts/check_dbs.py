@@ -26,10 +26,10 @@ try:
     mcur = mconn.cursor()
     mcur.execute('SELECT id,name,watt_per_hour FROM devices')
     print('MySQL devices:')
-    print(json.dumps(mcur.fetchall(), indent=2))
+    print(json.dumps(mcur.fetchall(), indent=2, default=str))
     mcur.execute('SELECT id,date,total_kwh,total_cost FROM records')
     print('MySQL records:')
-    print(json.dumps(mcur.fetchall(), indent=2))
+    print(json.dumps(mcur.fetchall(), indent=2, default=str))
     mcur.close(); mconn.close()
 except Exception as e:
     print('MySQL error:', e)
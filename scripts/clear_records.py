@@ -11,14 +11,15 @@ Usage (Windows cmd):
     "C:\Program Files\Python313\python.exe" scripts\clear_records.py --username alice
 
 If --username is omitted, all records and record_items will be deleted.
-This script does NOT delete users or devices; it only clears records and record_items.
+This script does NOT delete users or devices; it only clears records and record_items,
+along with their usage_daily / usage_monthly rollup rows.
 """
 import argparse
 import os
 import sys
 
 # Ensure project package imports work
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "killua_t")))
 from database import db as _db
 
 parser = argparse.ArgumentParser()
@@ -44,11 +45,16 @@ try:
             # Use executemany to delete by id
             cursor.executemany("DELETE FROM record_items WHERE record_id = ?", [(rid,) for rid in rec_ids])
         cursor.execute("DELETE FROM records WHERE user_id = ?", (uid,))
+        # Drop the user's rollup rows in the same transaction
+        cursor.execute("DELETE FROM usage_daily WHERE user_id = ?", (uid,))
+        cursor.execute("DELETE FROM usage_monthly WHERE user_id = ?", (uid,))
         conn.commit()
         print(f"Deleted records for user '{args.username}'.")
     else:
         cursor.execute("DELETE FROM record_items")
         cursor.execute("DELETE FROM records")
+        cursor.execute("DELETE FROM usage_daily")
+        cursor.execute("DELETE FROM usage_monthly")
         conn.commit()
         print("Deleted all records and record_items.")
 except Exception as e:
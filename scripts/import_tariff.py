@@ -0,0 +1,57 @@
+"""Load a tariff definition from a JSON file into the database.
+
+Usage (Windows cmd):
+  "C:\Program Files\Python313\python.exe" scripts\import_tariff.py meralco_2024_06.json
+
+File format (amounts in PHP; percent components apply to the running subtotal):
+
+    {
+      "name": "Meralco residential June 2024",
+      "effective_from": "2024-06-01",
+      "components": [
+        {"name": "Generation", "kind": "per_kwh", "amount": 6.87},
+        {"name": "Transmission", "kind": "per_kwh", "amount": 0.98},
+        {"name": "Distribution", "kind": "per_kwh", "amount": 1.45},
+        {"name": "Metering", "kind": "fixed", "amount": 5.00},
+        {"name": "VAT", "kind": "percent", "amount": 12}
+      ],
+      "tiers": [
+        {"kind": "lifeline", "lower_kwh": 0, "upper_kwh": 21, "amount": 100},
+        {"kind": "lifeline", "lower_kwh": 21, "upper_kwh": 51, "amount": 50},
+        {"kind": "block", "lower_kwh": 200, "upper_kwh": null, "amount": 0.25}
+      ]
+    }
+"""
+import os
+import sys
+import json
+import argparse
+from datetime import datetime
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'killua_t')))
+
+from core.tariff import Component, Tariff, Tier
+from database.tariffs import save_tariff
+
+parser = argparse.ArgumentParser(description='Import a tariff definition (JSON).')
+parser.add_argument('file', help='Path to the tariff JSON file')
+args = parser.parse_args()
+
+with open(args.file, encoding='utf-8') as f:
+    spec = json.load(f)
+
+try:
+    tariff = Tariff(
+        spec['name'],
+        [Component(c['name'], c['kind'], c['amount']) for c in spec.get('components', [])],
+        [Tier(t['kind'], t['lower_kwh'], t.get('upper_kwh'), t['amount']) for t in spec.get('tiers', [])],
+        effective_from=datetime.fromisoformat(spec['effective_from']) if spec.get('effective_from') else None,
+    )
+except (KeyError, ValueError) as e:
+    print('Invalid tariff file:', e)
+    raise SystemExit(1)
+
+tariff_id = save_tariff(tariff)
+print(f"Imported tariff '{tariff.name}' as id {tariff_id}.")
+for kwh in (20, 50, 100, 200, 300):
+    print(f"  {kwh:>4} kWh -> PHP {tariff.bill(kwh).total:,.2f}")
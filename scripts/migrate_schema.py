@@ -0,0 +1,37 @@
+"""Apply pending schema migrations to the configured MySQL database.
+
+Usage (Windows cmd):
+  "C:\Program Files\Python313\python.exe" scripts\migrate_schema.py
+  "C:\Program Files\Python313\python.exe" scripts\migrate_schema.py --status
+
+The app also applies migrations automatically at startup; this script is for
+running them ahead of time (e.g. before rolling out a new build).
+"""
+import os
+import sys
+import argparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'killua_t')))
+
+from database import db as _db
+from database import migrations
+
+parser = argparse.ArgumentParser(description='Apply or inspect schema migrations.')
+parser.add_argument('--status', action='store_true', help='Only print the current and latest schema versions')
+parser.add_argument('--target', type=int, help='Migrate up to this version instead of the latest')
+args = parser.parse_args()
+
+with _db.pool.connection() as conn:
+    cur = conn.cursor()
+    try:
+        current = migrations.current_version(cur)
+        print('Current schema version:', current if current is not None else 'none')
+        print('Latest schema version: ', migrations.latest_version())
+        if not args.status:
+            applied = migrations.migrate(conn, cur, target=args.target)
+            if applied:
+                print('Applied:', ', '.join(str(v) for v in applied))
+            else:
+                print('Nothing to apply.')
+    finally:
+        cur.close()
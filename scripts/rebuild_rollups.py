@@ -0,0 +1,37 @@
+"""Rebuild the usage_daily / usage_monthly rollup tables from records and record_items.
+
+Usage (Windows cmd):
+  "C:\Program Files\Python313\python.exe" scripts\rebuild_rollups.py
+  "C:\Program Files\Python313\python.exe" scripts\rebuild_rollups.py --username alice
+
+The app keeps the rollups current as days are saved, deleted and re-priced;
+run this after editing records by hand or restoring a backup.
+"""
+import os
+import sys
+import argparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'killua_t')))
+
+from database import db as _db
+from database import rollups
+
+parser = argparse.ArgumentParser(description='Recompute the usage rollup tables.')
+parser.add_argument('--username', '-u', help='Only rebuild this user\'s rows')
+args = parser.parse_args()
+
+user_id = None
+if args.username:
+    _db.cursor.execute("SELECT id FROM users WHERE username = ?", (args.username,))
+    row = _db.cursor.fetchone()
+    if not row:
+        print(f"User '{args.username}' not found.")
+        raise SystemExit(1)
+    user_id = row[0]
+
+rollups.rebuild(user_id)
+_db.cursor.execute("SELECT COUNT(*) FROM usage_daily")
+daily = _db.cursor.fetchone()[0]
+_db.cursor.execute("SELECT COUNT(*) FROM usage_monthly")
+monthly = _db.cursor.fetchone()[0]
+print(f"Rollups rebuilt: {daily} daily row(s), {monthly} monthly row(s).")
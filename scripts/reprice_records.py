@@ -0,0 +1,48 @@
+"""Re-price stored records and record items with the Meralco rate in force at each record's date.
+
+Usage (Windows cmd):
+  "C:\Program Files\Python313\python.exe" scripts\reprice_records.py
+  "C:\Program Files\Python313\python.exe" scripts\reprice_records.py --since 2024-01-01 --until 2024-02-01
+  "C:\Program Files\Python313\python.exe" scripts\reprice_records.py --username alice --chunk-size 1000
+
+Records are processed in chunks, each committed separately, so the script can
+be interrupted and re-run safely.
+"""
+import os
+import sys
+import argparse
+from datetime import datetime
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'killua_t')))
+
+from database import db as _db
+from database.repricing import reprice
+
+parser = argparse.ArgumentParser(description='Recompute record costs from the rate history.')
+parser.add_argument('--since', help='Only records dated on/after this date (YYYY-MM-DD)')
+parser.add_argument('--until', help='Only records dated before this date (YYYY-MM-DD)')
+parser.add_argument('--username', '-u', help='Only records for this user')
+parser.add_argument('--chunk-size', type=int, default=500, help='Records per transaction (default 500)')
+args = parser.parse_args()
+
+since = datetime.fromisoformat(args.since) if args.since else None
+until = datetime.fromisoformat(args.until) if args.until else None
+
+user_id = None
+if args.username:
+    _db.cursor.execute("SELECT id FROM users WHERE username = ?", (args.username,))
+    row = _db.cursor.fetchone()
+    if not row:
+        print(f"User '{args.username}' not found.")
+        raise SystemExit(1)
+    user_id = row[0]
+
+
+def show_progress(done, total):
+    print(f"\r{done}/{total} records", end="", flush=True)
+
+
+result = reprice(since=since, until=until, user_id=user_id, chunk_size=args.chunk_size, progress=show_progress)
+print()
+print(f"Examined {result.records} records / {result.items} items; "
+      f"updated {result.records_changed} records / {result.items_changed} items.")